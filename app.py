@@ -1,5 +1,7 @@
 import customtkinter as ctk
 import hashlib
+import logging
+import threading
 from tkinter import messagebox
 from datetime import datetime, timedelta
 
@@ -8,12 +10,21 @@ from modules.users_db import UsersDB
 from modules.subjects_db import SubjectsDB
 from modules.goals_db import GoalsHelper
 from modules.attendance_db import AttendanceDB
-from modules.planner_logic import PlannerLogic
+from modules.planner_logic import PlannerLogic, WHAT_IF_TARGETS, WHAT_IF_ATTENDANCE
+from modules.write_behind import WriteBehindQueue
+from modules.outcomes_db import OutcomesDB
+from modules.score_series import default_series
+from ml import retrainer
+from ml.agents import default_registry
+from ml.performance_predictor import PerformancePredictor
+from modules import metrics, query_budget, stall_watchdog
 
 # Global Configuration
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("blue")
 
+log = logging.getLogger(__name__)
+
 class AcademicMentorApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -32,6 +43,17 @@ class AcademicMentorApp(ctk.CTk):
 
         # Initialize Core User DB
         self.users_db = UsersDB()
+
+        # Saves are committed in the background; see modules/write_behind.py
+        self.writes = WriteBehindQueue()
+        self._closing = False
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Opt-in via ACADEMIC_STALL_MS; logs the callback behind any UI freeze
+        self.watchdog = stall_watchdog.install(self)
+
+        # Opt-in via ACADEMIC_RETRAIN_INTERVAL; learns from logged plan outcomes off the UI thread
+        self.retrainer = retrainer.start_background(default_registry)
         
         # Start at Login
         self.show_login_frame()
@@ -62,9 +84,47 @@ class AcademicMentorApp(ctk.CTk):
     def show_main_app(self):
         self.switch_frame(MainAppFrame, user=self.current_user)
 
+    def after_saved(self, on_done, timeout=10):
+        """
+        Calls on_done(saved) on the UI thread once the queued saves are
+        committed; saved is False if they failed or took longer than timeout.
+        """
+        result = []
+        threading.Thread(target=lambda: result.append(self.writes.flush(timeout)), daemon=True).start()
+
+        def poll():
+            if result:
+                on_done(result[0])
+            else:
+                self.after(100, poll)
+        self.after(100, poll)
+
     def logout(self):
-        self.current_user = None
-        self.show_login_frame()
+        # Pending saves are committed off the UI thread; the page stays up until they are
+        def done(saved):
+            if not saved:
+                messagebox.showwarning("Not Saved", "Some of your recent changes could not be saved.")
+            self.current_user = None
+            self.show_login_frame()
+        self.after_saved(done)
+
+    def on_close(self):
+        if self._closing:
+            return
+        self._closing = True
+
+        def done(saved):
+            if not saved and not messagebox.askyesno(
+                    "Not Saved", "Some of your recent changes could not be saved. Quit anyway?"):
+                self._closing = False
+                return
+            if self.watchdog:
+                self.watchdog.stop()
+            if self.retrainer:
+                self.retrainer.stop()
+            self.writes.close(timeout=0)   # already flushed above; don't block the UI on a retry
+            self.destroy()
+        self.after_saved(done)
 
 
 # ---------------------------------------------------------
@@ -211,8 +271,9 @@ class MainAppFrame(ctk.CTkFrame):
             widget.destroy()
         
         # Load new page
-        frame = frame_class(self.content, self.app, self.user)
-        frame.pack(fill="both", expand=True, padx=20, pady=20)
+        with metrics.timer(f"ui.show_page.{name}"), query_budget.track(f"ui.show_page.{name}"):
+            frame = frame_class(self.content, self.app, self.user)
+            frame.pack(fill="both", expand=True, padx=20, pady=20)
 
 
 # ---------------------------------------------------------
@@ -236,7 +297,7 @@ class DashboardPage(ctk.CTkFrame):
         stats_frame.pack(fill="x")
 
         # 1. Attendance Stat (Updated for Manual Percentage)
-        att_data = self.att_db.get_attendance_percent(user["id"])
+        att_data = app.writes.get_attendance_percent(user["id"])
         if att_data:
             # Average of all subject percentages
             att_pct = int(sum(att_data.values()) / len(att_data))
@@ -253,6 +314,23 @@ class DashboardPage(ctk.CTkFrame):
         else:
             self.create_card(stats_frame, "Avg Score", "N/A", "#FFF3E0", "#EF6C00")
 
+        # 3. Weak Subjects (low score, declining trend, recent drop or low attendance)
+        weak = PerformancePredictor().weak_subjects([user["id"]]).get(user["id"], {})
+        self.create_card(stats_frame, "Weak Subjects", str(len(weak)), "#FFEBEE", "#C62828")
+
+        if weak:
+            weak_frame = ctk.CTkFrame(self, fg_color="#FFF5F5", corner_radius=10)
+            weak_frame.pack(fill="x", pady=20, padx=10)
+            ctk.CTkLabel(weak_frame, text="Needs Attention", font=("Segoe UI", 14, "bold"),
+                         text_color="#C62828").pack(anchor="w", padx=10, pady=(10, 5))
+            for subj, reasons in weak.items():
+                ctk.CTkLabel(weak_frame, text=f"• {subj}: {', '.join(reasons)}", anchor="w").pack(fill="x", padx=15)
+            ctk.CTkLabel(weak_frame, text="").pack(pady=2)
+
+        # 4. Score trend per subject
+        if scores:
+            ScoreTrendChart(self, user["id"], app.primary_blue).pack(fill="x", pady=(20, 0), padx=10)
+
     def create_card(self, parent, title, value, bg, text_color):
         card = ctk.CTkFrame(parent, fg_color=bg, corner_radius=12, height=100)
         card.pack(side="left", padx=10, expand=True, fill="x")
@@ -262,6 +340,90 @@ class DashboardPage(ctk.CTkFrame):
         ctk.CTkLabel(card, text=value, font=("Segoe UI", 28, "bold"), text_color=text_color).pack(pady=(0, 10))
 
 
+class ScoreTrendChart(ctk.CTkFrame):
+    """
+    Score-over-time line for one subject. Asks for at most one point per pixel
+    of plot width; the series are downsampled and cached in modules/score_series.py.
+    """
+    PAD = 36          # room for the axis labels
+    HEIGHT = 180
+    REDRAW_DELAY_MS = 100
+
+    def __init__(self, master, user_id, color, series=default_series):
+        super().__init__(master, fg_color="#F8F9FA", corner_radius=10)
+        self.user_id = user_id
+        self.color = color
+        self.series = series
+        self.subject = None
+        self._width = 0
+        self._redraw_job = None
+
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.pack(fill="x", padx=10, pady=(10, 0))
+        ctk.CTkLabel(header, text="Score Trend", font=("Segoe UI", 14, "bold")).pack(side="left")
+        self.menu = ctk.CTkOptionMenu(header, values=[""], width=160, command=self.select)
+        self.menu.pack(side="right")
+
+        self.canvas = ctk.CTkCanvas(self, height=self.HEIGHT, bg="#F8F9FA", highlightthickness=0)
+        self.canvas.pack(fill="x", padx=10, pady=10)
+        self.canvas.bind("<Configure>", self._on_resize)
+
+    def select(self, subject):
+        self.subject = subject
+        self.redraw()
+
+    def _on_resize(self, event):
+        if event.width == self._width:
+            return
+        self._width = event.width
+        # Dragging the window fires many resizes; draw once it settles
+        if self._redraw_job:
+            self.after_cancel(self._redraw_job)
+        self._redraw_job = self.after(self.REDRAW_DELAY_MS, self.redraw)
+
+    def redraw(self):
+        self._redraw_job = None
+        plot_w = self._width - 2 * self.PAD
+        if plot_w < 10:
+            return
+        data = self.series.get_series(self.user_id, max_points=plot_w)
+        if not data:
+            return
+        subjects = sorted(data)
+        self.menu.configure(values=subjects)
+        if self.subject not in data:
+            self.subject = subjects[0]
+        self.menu.set(self.subject)
+        self._draw(*data[self.subject], plot_w)
+
+    def _draw(self, dates, pcts, plot_w):
+        c = self.canvas
+        c.delete("all")
+        top, plot_h = 10, self.HEIGHT - 40
+        for pct in (0, 50, 100):
+            y = top + (100 - pct) / 100 * plot_h
+            c.create_line(self.PAD, y, self.PAD + plot_w, y, fill="#E0E0E0")
+            c.create_text(self.PAD - 6, y, text=f"{pct}%", anchor="e", fill="gray", font=("Segoe UI", 9))
+        if not dates:
+            return
+
+        first, span = dates[0].toordinal(), max(1, dates[-1].toordinal() - dates[0].toordinal())
+        coords = []
+        for d, pct in zip(dates, pcts):
+            coords.append(self.PAD + (d.toordinal() - first) / span * plot_w)
+            coords.append(top + (100 - min(100.0, max(0.0, pct))) / 100 * plot_h)
+        if len(dates) > 1:
+            c.create_line(*coords, fill=self.color, width=2)
+        if len(dates) <= 40:
+            for x, y in zip(coords[::2], coords[1::2]):
+                c.create_oval(x - 3, y - 3, x + 3, y + 3, fill=self.color, outline="")
+
+        bottom = top + plot_h + 14
+        c.create_text(self.PAD, bottom, text=dates[0].strftime("%b %Y"), anchor="w", fill="gray", font=("Segoe UI", 9))
+        c.create_text(self.PAD + plot_w, bottom, text=dates[-1].strftime("%b %Y"), anchor="e", fill="gray",
+                      font=("Segoe UI", 9))
+
+
 class GoalsPage(ctk.CTkFrame):
     def __init__(self, master, app, user):
         super().__init__(master)
@@ -321,12 +483,13 @@ class GoalsPage(ctk.CTkFrame):
         grid_frame = ctk.CTkFrame(target_frame, fg_color="transparent")
         grid_frame.pack(fill="x", padx=10, pady=(0, 10))
 
+        saved_targets = self.app.writes.get_subject_targets(self.user["id"], subjects)
         for i, subj in enumerate(subjects):
             ctk.CTkLabel(grid_frame, text=subj, width=100, anchor="w").grid(row=i, column=0, padx=10, pady=5)
             ent = ctk.CTkEntry(grid_frame, width=80, placeholder_text="90")
             ent.grid(row=i, column=1, padx=10, pady=5)
             
-            saved_target = self.goals_db.get_subject_target(self.user["id"], subj)
+            saved_target = saved_targets.get(subj)
             if saved_target: ent.insert(0, int(saved_target))
             
             self.target_entries[subj] = ent
@@ -370,20 +533,27 @@ class GoalsPage(ctk.CTkFrame):
                 ctk.CTkLabel(hist_frame, text=f"• {subj} ({exam}): {sc}/{mx} ({pct}%)", anchor="w").pack(fill="x", padx=5)
 
     def save_targets(self):
-        count = 0
+        targets = {}
         for subj, ent in self.target_entries.items():
             val = ent.get().strip()
             if val:
                 try:
-                    target = float(val)
-                    self.goals_db.set_subject_target(self.user["id"], subj, target)
-                    count += 1
+                    targets[subj] = float(val)
                 except ValueError:
                     continue
-        if count > 0:
-            messagebox.showinfo("Saved", f"Updated targets for {count} subjects.")
-        else:
+        count = len(targets)
+        if count == 0:
             messagebox.showwarning("Info", "No valid targets entered.")
+            return
+        # Committed in the background, one transaction for every changed target
+        self.app.writes.set_subject_targets(self.user["id"], targets)
+
+        def done(saved):
+            if saved:
+                messagebox.showinfo("Saved", f"Updated targets for {count} subjects.")
+            else:
+                messagebox.showerror("Not Saved", "Your targets could not be saved. Please try again.")
+        self.app.after_saved(done)
 
     def add_score(self):
         try:
@@ -403,7 +573,7 @@ class AttendancePage(ctk.CTkFrame):
         super().__init__(master)
         self.configure(fg_color="white")
         self.user = user
-        self.att_db = AttendanceDB()
+        self.app = app
         self.sub_db = SubjectsDB()
 
         ctk.CTkLabel(self, text="Attendance Manager", font=("Segoe UI", 22, "bold"), 
@@ -441,7 +611,9 @@ class AttendancePage(ctk.CTkFrame):
         try:
             val = float(self.pct_entry.get())
             if 0 <= val <= 100:
-                self.att_db.set_attendance_percentage(self.user["id"], subj, val)
+                self.app.writes.set_attendance_percentage(self.user["id"], subj, val)
+                self.app.after_saved(lambda saved: saved or messagebox.showerror(
+                    "Not Saved", f"Attendance for {subj} could not be saved. Please try again."))
                 self.refresh_stats()
                 self.pct_entry.delete(0, "end")
             else:
@@ -453,7 +625,7 @@ class AttendancePage(ctk.CTkFrame):
         for w in self.stats_frame.winfo_children(): w.destroy()
         
         # Now returns {Subject: Percentage}
-        data = self.att_db.get_attendance_percent(self.user["id"])
+        data = self.app.writes.get_attendance_percent(self.user["id"])
         
         if not data:
             ctk.CTkLabel(self.stats_frame, text="No attendance records updated yet.").pack(pady=20)
@@ -479,6 +651,7 @@ class PlannerPage(ctk.CTkFrame):
         super().__init__(master)
         self.configure(fg_color="white")
         self.user = user
+        self.app = app
         # Initialize Logic with User ID
         self.logic = PlannerLogic(user["id"])
         self.sub_db = SubjectsDB()
@@ -491,13 +664,83 @@ class PlannerPage(ctk.CTkFrame):
                      text_color="gray").pack(anchor="w", pady=(0, 10))
 
         # Main Action
-        ctk.CTkButton(self, text="⚡ Generate New Plan", height=45, font=("Segoe UI", 16, "bold"),
-                      fg_color=app.primary_blue, command=self.generate).pack(fill="x", padx=10, pady=10)
+        self.generate_button = ctk.CTkButton(self, text="⚡ Generate New Plan", height=45,
+                                             font=("Segoe UI", 16, "bold"), fg_color=app.primary_blue,
+                                             command=self.generate)
+        self.generate_button.pack(fill="x", padx=10, pady=10)
+        self._plan_result = None
+
+        # What-if: the whole grid is predicted once in the background; the sliders only index into it
+        whatif = ctk.CTkFrame(self, fg_color="#F8F9FA", corner_radius=10)
+        whatif.pack(fill="x", padx=10)
+        whatif.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(whatif, text="What if I aim for...", font=("Segoe UI", 14, "bold")).grid(
+            row=0, column=0, columnspan=3, sticky="w", padx=10, pady=(10, 0))
+        self.target_slider, self.target_value = self._what_if_slider(whatif, 1, "Target", WHAT_IF_TARGETS, 90)
+        self.att_slider, self.att_value = self._what_if_slider(whatif, 2, "Attendance", WHAT_IF_ATTENDANCE, 80)
+        self.what_if_label = ctk.CTkLabel(whatif, text="Working out the options...", text_color="gray",
+                                          justify="left", anchor="w")
+        self.what_if_label.grid(row=3, column=0, columnspan=3, sticky="w", padx=10, pady=(0, 10))
+        self.what_if = None
+        self._what_if_result = None
+        threading.Thread(target=self._compute_what_if, daemon=True).start()
+        self.after(50, self._poll_what_if)
 
         # Results Area
         self.results_frame = ctk.CTkScrollableFrame(self, fg_color="#F8F9FA")
         self.results_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
+    def _what_if_slider(self, parent, row, name, grid, value):
+        # One slider step per grid point, so the label always names a value the grid was predicted for
+        ctk.CTkLabel(parent, text=name, width=80, anchor="w").grid(row=row, column=0, padx=10, pady=5, sticky="w")
+        slider = ctk.CTkSlider(parent, from_=grid[0], to=grid[-1], number_of_steps=len(grid) - 1,
+                               command=self.update_what_if)
+        slider.set(value)
+        slider.configure(state="disabled")
+        slider.grid(row=row, column=1, sticky="ew", pady=5)
+        value_label = ctk.CTkLabel(parent, text=f"{value}%", width=50)
+        value_label.grid(row=row, column=2, padx=10)
+        return slider, value_label
+
+    def _compute_what_if(self):
+        # Worker thread: no widget access here, _poll_what_if picks the result up
+        try:
+            subjects = self.sub_db.get_subjects(self.user["id"])
+            if not subjects:
+                raise ValueError("No subjects yet.")
+            class_slots = self.logic.class_slots_for(datetime.now().weekday())
+            self._what_if_result = self.logic.what_if(subjects, class_slots_today=class_slots)
+        except Exception as e:
+            self._what_if_result = e
+
+    def _poll_what_if(self):
+        if not self.winfo_exists():
+            return
+        result = self._what_if_result
+        if result is None:
+            self.after(50, self._poll_what_if)
+            return
+        if isinstance(result, Exception):
+            self.what_if_label.configure(text=f"What-if unavailable: {result}")
+            return
+        self.what_if = result
+        self.target_slider.configure(state="normal")
+        self.att_slider.configure(state="normal")
+        self.update_what_if()
+
+    def update_what_if(self, _=None):
+        target, attendance = self.target_slider.get(), self.att_slider.get()
+        self.target_value.configure(text=f"{round(target)}%")
+        self.att_value.configure(text=f"{round(attendance)}%")
+        if self.what_if is None:
+            return
+        hours = self.what_if.at(target, attendance)
+        lines = [f"{subj}: {h:.1f} hrs" for subj, h in hours.items()]
+        lines.append(f"Total: {sum(hours.values()):.1f} hrs (about {self.what_if.available_hours} hrs free today)")
+        if self.what_if.agent != self.logic.agent:
+            lines.append("Model still loading - estimated hours.")
+        self.what_if_label.configure(text="\n".join(lines), text_color=self.app.dark_text)
+
     def generate(self):
         # Clean old results
         for w in self.results_frame.winfo_children(): w.destroy()
@@ -510,25 +753,56 @@ class PlannerPage(ctk.CTkFrame):
             return
 
         # 2. Check for Missing Targets
-        missing_targets = []
-        for s in subjects:
-            if not self.goals_db.get_subject_target(self.user["id"], s):
-                missing_targets.append(s)
+        targets = self.app.writes.get_subject_targets(self.user["id"], subjects)
+        missing_targets = [s for s in subjects if not targets.get(s)]
         
         if missing_targets:
             msg = f"Target Marks missing for:\n{', '.join(missing_targets)}\n\nPlease set them in 'Goals & Subjects' page."
             ctk.CTkLabel(self.results_frame, text=msg, text_color="#C62828", font=("Segoe UI", 14)).pack(pady=20)
             return
 
-        # 3. Generate Plan (ML Magic)
-        # Note: We assume 4 slots occupied for now, or fetch from timetable
+        # 3. Generate Plan (ML Magic) in the background; _poll_plan shows it
+        self.generate_button.configure(state="disabled")
+        ctk.CTkLabel(self.results_frame, text="Working out your plan...", text_color="gray").pack(pady=20)
+        self._plan_result = None
+        threading.Thread(target=self._compute_plan, args=(subjects,), daemon=True).start()
+        self.after(50, self._poll_plan)
+
+    def _compute_plan(self, subjects):
+        # Worker thread: no widget access here, _poll_plan picks the result up
         try:
-            # Force refresh db helpers inside logic
-            plan = self.logic.generate_daily_plan(subjects, class_slots_today=5)
+            # PlannerLogic reads the database directly, so commit pending saves first
+            if not self.app.writes.flush(timeout=10):
+                raise RuntimeError("your latest changes could not be saved, so the plan would use old data")
+            class_slots = self.logic.class_slots_for(datetime.now().weekday())
+            plan = self.logic.generate_daily_plan(subjects, class_slots_today=class_slots)
+            predictions, agent = self.logic.last_predictions, self.logic.last_agent_used
         except Exception as e:
-            ctk.CTkLabel(self.results_frame, text=f"Error generating plan: {str(e)}", text_color="red").pack()
+            self._plan_result = e
             return
+        self._plan_result = (plan, agent)
+        # Log what the model predicted so retraining can learn from the next exam;
+        # the plan is already on screen, so a failure here only costs training data
+        try:
+            OutcomesDB().record_plan(self.user["id"], predictions, agent)
+        except Exception:
+            log.exception("Could not record the plan for retraining")
 
+    def _poll_plan(self):
+        if not self.winfo_exists():
+            return
+        result = self._plan_result
+        if result is None:
+            self.after(50, self._poll_plan)
+            return
+        self.generate_button.configure(state="normal")
+        for w in self.results_frame.winfo_children(): w.destroy()
+        if isinstance(result, Exception):
+            ctk.CTkLabel(self.results_frame, text=f"Error generating plan: {str(result)}", text_color="red").pack()
+            return
+        self.show_plan(*result)
+
+    def show_plan(self, plan, agent):
         if not plan:
             ctk.CTkLabel(self.results_frame, text="Could not generate plan. Check inputs.").pack()
             return
@@ -537,6 +811,10 @@ class PlannerPage(ctk.CTkFrame):
         ctk.CTkLabel(self.results_frame, text="Recommended Study Hours", font=("Segoe UI", 16, "bold"), 
                      text_color="#1565C0").pack(anchor="w", pady=(10, 15), padx=10)
 
+        if agent != self.logic.agent:
+            ctk.CTkLabel(self.results_frame, text="Model still loading - showing estimated hours.",
+                         text_color="#757575", font=("Segoe UI", 12)).pack(anchor="w", padx=10, pady=(0, 10))
+
         for subj, hours in plan.items():
             # Color coding based on intensity
             if hours < 1.0: 
@@ -0,0 +1,35 @@
+"""
+Builds throwaway benchmark databases (SQLite files or a scratch PostgreSQL DB).
+
+Rows come from seed_test_data.seed(), so fixtures use the real schema and
+the same skewed distributions as load-test databases.
+"""
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+# name -> (users, subjects per user, mean exams per subject)
+SCALES = {
+    "1": (1, 5, 10),
+    "1k": (1_000, 5, 10),
+    "100k": (100_000, 5, 20),  # ~10M scores
+}
+
+
+def build_db(url, users, subjects_per_user=5, exams_per_subject=10, seed=42):
+    """
+    Seeds a fresh benchmark DB at `url` and returns the number of score rows written.
+    Existing rows in the seeded tables are deleted, so only point this at a scratch database.
+    """
+    from seed_test_data import seed as seed_db
+
+    db_url = make_url(url)
+    if db_url.get_backend_name() == "sqlite" and db_url.database and os.path.exists(db_url.database):
+        os.remove(db_url.database)
+    engine = create_engine(url)
+    try:
+        counts = seed_db(engine, users, subjects_per_user, exams_per_subject, seed=seed)
+    finally:
+        engine.dispose()
+    return counts["scores"]
@@ -0,0 +1,89 @@
+"""
+Runs the benchmark suite against every supported backend.
+
+    python -m benchmarks.matrix --scale 1k
+    python -m benchmarks.matrix --scale 1k --pg-url postgresql+psycopg2://localhost/academic_bench
+    python -m benchmarks.matrix --scale 1k --start-postgres
+
+SQLite always runs. PostgreSQL runs against --pg-url (or ACADEMIC_PG_URL),
+or against a throwaway cluster started with initdb/pg_ctl when
+--start-postgres is given. Each backend runs in its own process because the
+database URL is bound when db.session is imported. Exits non-zero if any
+backend fails or regresses against its baseline.
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalPostgres:
+    """A temporary PostgreSQL cluster owned by this process."""
+
+    def __init__(self):
+        self.datadir = None
+        self.port = None
+
+    def __enter__(self):
+        for tool in ("initdb", "pg_ctl", "createdb"):
+            if not shutil.which(tool):
+                raise SystemExit(f"--start-postgres needs '{tool}' on PATH")
+        self.datadir = tempfile.mkdtemp(prefix="academic-pg-")
+        self.port = _free_port()
+        subprocess.run(["initdb", "-D", self.datadir, "-U", "postgres", "--auth=trust"],
+                       check=True, capture_output=True)
+        subprocess.run(["pg_ctl", "-D", self.datadir, "-w", "-l", os.path.join(self.datadir, "server.log"),
+                        "-o", f"-p {self.port} -k {self.datadir} -c listen_addresses=127.0.0.1", "start"],
+                       check=True, capture_output=True)
+        subprocess.run(["createdb", "-h", "127.0.0.1", "-p", str(self.port), "-U", "postgres", "academic_bench"],
+                       check=True, capture_output=True)
+        return f"postgresql+psycopg2://postgres@127.0.0.1:{self.port}/academic_bench"
+
+    def __exit__(self, *exc):
+        subprocess.run(["pg_ctl", "-D", self.datadir, "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(self.datadir, ignore_errors=True)
+        return False
+
+
+def run_backend(label, extra_args):
+    print(f"=== {label} ===", flush=True)
+    return subprocess.run([sys.executable, "-m", "benchmarks.run", *extra_args]).returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pg-url", default=os.environ.get("ACADEMIC_PG_URL"))
+    parser.add_argument("--start-postgres", action="store_true")
+    args, passthrough = parser.parse_known_args()
+
+    failures = []
+    if run_backend("sqlite", passthrough) != 0:
+        failures.append("sqlite")
+
+    if args.start_postgres:
+        with LocalPostgres() as url:
+            if run_backend("postgresql (local)", passthrough + ["--db-url", url]) != 0:
+                failures.append("postgresql")
+    elif args.pg_url:
+        if run_backend("postgresql", passthrough + ["--db-url", args.pg_url]) != 0:
+            failures.append("postgresql")
+    else:
+        print("PostgreSQL skipped: pass --pg-url, set ACADEMIC_PG_URL or use --start-postgres")
+
+    if failures:
+        print(f"FAILED backends: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
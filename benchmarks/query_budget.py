@@ -0,0 +1,115 @@
+"""
+SQL statement budgets for the planner and the UI's page loads and saves.
+
+    python -m benchmarks.query_budget
+    python -m benchmarks.query_budget --subjects 50
+
+Seeds one user with --subjects subjects in a temporary SQLite file and runs
+each operation under modules.query_budget.statement_budget(). Budgets do not
+depend on the number of subjects, so a query per subject (N+1) makes the
+run fail with the offending statements listed and exit non-zero. Each
+operation runs once untracked first, so one-time work (schema checks, model
+load) is not counted.
+
+Page checks make the same calls the page constructors do, reading through
+the write-behind queue like the app. Save checks commit a batch the way the
+queue's writer thread does, with values that differ on every run so the
+UPDATEs are counted, not just the lookup.
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+
+def checks(user_id, subjects):
+    """(label, statement budget, fn)"""
+    from datetime import datetime
+    from modules.subjects_db import SubjectsDB
+    from modules.goals_db import GoalsHelper
+    from modules.planner_logic import PlannerLogic
+    from modules.score_series import ScoreSeries
+    from modules.write_behind import WriteBehindQueue, TARGETS, ATTENDANCE, SLOTS
+    from ml.performance_predictor import PerformancePredictor
+
+    subjects_db, goals_db, writes = SubjectsDB(), GoalsHelper(), WriteBehindQueue()
+    planner = PlannerLogic(user_id)
+    n = len(subjects)
+    runs = itertools.count()
+
+    def dashboard_page():
+        writes.get_attendance_percent(user_id)
+        goals_db.get_subject_totals(user_id)
+        PerformancePredictor().weak_subjects([user_id])
+        ScoreSeries().get_series(user_id, max_points=600)   # a fresh cache: the first visit's load
+
+    def goals_page():
+        writes.get_subject_targets(user_id, subjects_db.get_subjects(user_id))
+        goals_db.get_scores_for_user(user_id)
+
+    def planner_page():
+        page_subjects = subjects_db.get_subjects(user_id)
+        class_slots = planner.class_slots_for(datetime.now().weekday())
+        planner.what_if(page_subjects, class_slots_today=class_slots)
+
+    def generate_plan():
+        page_subjects = subjects_db.get_subjects(user_id)
+        writes.get_subject_targets(user_id, page_subjects)
+        class_slots = planner.class_slots_for(datetime.now().weekday())
+        planner.generate_daily_plan(page_subjects, class_slots_today=class_slots)
+
+    def save(kind, values):
+        def fn():
+            failed = writes._write({(kind, user_id): values(next(runs))})
+            assert not failed, f"{kind} save failed"
+        return fn
+
+    return [
+        ("dashboard page", 6, dashboard_page),
+        (f"goals page with {n} subjects", 3, goals_page),
+        (f"planner page with {n} subjects", 3, planner_page),
+        (f"generate plan for {n} subjects", 8, generate_plan),
+        (f"save {n} targets", 2, save(TARGETS, lambda run: {s: 70.0 + run % 2 for s in subjects})),
+        (f"save {n} attendance values", 2, save(ATTENDANCE, lambda run: {s: 75.0 + run % 2 for s in subjects})),
+        (f"save {n} timetable cells", 4,
+         save(SLOTS, lambda run: {(0, i): (s, "Lecture" if run % 2 else "Lab") for i, s in enumerate(subjects)})),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="academic-budget-")
+    url = f"sqlite:///{os.path.join(workdir, 'academic.db')}"
+    os.environ["ACADEMIC_DB_URL"] = url
+    try:
+        # Imported late so they bind to ACADEMIC_DB_URL
+        from benchmarks.fixtures import build_db
+        from modules.query_budget import BudgetExceeded, statement_budget
+        from modules.subjects_db import SubjectsDB
+
+        build_db(url, users=1, subjects_per_user=args.subjects, exams_per_subject=5)
+        subjects = SubjectsDB().get_subjects(1)
+
+        failures = 0
+        for label, budget, fn in checks(1, subjects):
+            fn()  # warm-up
+            try:
+                with statement_budget(budget, label) as usage:
+                    fn()
+                print(f"  ok    {label}: {usage.statements}/{budget} statements, {usage.sessions} sessions, "
+                      f"{usage.rows} rows written")
+            except BudgetExceeded as e:
+                failures += 1
+                print(f"  FAIL  {e}")
+        return 1 if failures else 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Micro-benchmark: ORM entity reads vs the column reads the DB helpers use.
+
+    python -m benchmarks.read_layer
+    python -m benchmarks.read_layer --rows 200000 --repeat 5
+
+Seeds one user with a large number of subjects, attendance rows and
+timetable cells in a temporary SQLite file, then reads them back both ways.
+Reports the fastest wall time and the peak Python allocation (tracemalloc)
+of each read.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+
+def measure(fn, repeat):
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def seed(engine, rows):
+    from db.session import Base, bulk_insert
+    from modules.subjects_db import Subject
+    from modules.attendance_db import ManualAttendance
+    from modules.timetable_db import TimetableEntry
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        bulk_insert(conn, Subject.__table__, [{"user_id": 1, "subject": f"S{i}"} for i in range(rows)])
+        bulk_insert(conn, ManualAttendance.__table__,
+                    [{"user_id": 1, "subject": f"S{i}", "percentage": float(i % 100)} for i in range(rows)])
+        bulk_insert(conn, TimetableEntry.__table__,
+                    [{"user_id": 1, "weekday": 0, "slot": i, "subject": f"S{i}", "class_type": "Lecture"}
+                     for i in range(rows)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="academic-read-")
+    os.environ["ACADEMIC_DB_URL"] = f"sqlite:///{os.path.join(workdir, 'academic.db')}"
+    try:
+        # Imported late so they bind to ACADEMIC_DB_URL
+        from db.session import engine, get_session
+        from modules.subjects_db import Subject, SubjectsDB
+        from modules.attendance_db import ManualAttendance, AttendanceDB
+        from modules.timetable_db import TimetableEntry, TimetableDB
+
+        seed(engine, args.rows)
+        subjects_db, att_db, tt_db = SubjectsDB(), AttendanceDB(), TimetableDB()
+
+        def entity_read(model, convert):
+            def read():
+                session = get_session()
+                try:
+                    return convert(session.query(model).filter_by(user_id=1).all())
+                finally:
+                    session.close()
+            return read
+
+        cases = [
+            ("get_subjects",
+             entity_read(Subject, lambda rows: [r.subject for r in rows]),
+             lambda: subjects_db.get_subjects(1)),
+            ("get_attendance_percent",
+             entity_read(ManualAttendance, lambda rows: {r.subject: r.percentage for r in rows}),
+             lambda: att_db.get_attendance_percent(1)),
+            ("get_slots_for_weekday",
+             entity_read(TimetableEntry, lambda rows: {r.slot: (r.subject, r.class_type) for r in rows}),
+             lambda: tt_db.get_slots_for_weekday(1, 0)),
+        ]
+
+        print(f"{args.rows} rows per read, best of {args.repeat}")
+        print(f"  {'read':<24}{'entities':>12}{'columns':>12}{'speedup':>9}{'entity peak':>14}{'column peak':>14}")
+        for name, old, new in cases:
+            assert old() == new(), name
+            old_s, old_peak = measure(old, args.repeat)
+            new_s, new_peak = measure(new, args.repeat)
+            print(f"  {name:<24}{old_s * 1000:10.1f}ms{new_s * 1000:10.1f}ms{old_s / new_s:8.2f}x"
+                  f"{old_peak / 2**20:12.1f}MB{new_peak / 2**20:12.1f}MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
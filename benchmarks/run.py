@@ -0,0 +1,221 @@
+"""
+Performance benchmark suite.
+
+    python -m benchmarks.run --scale 1k
+    python -m benchmarks.run --scale 1k --save-baseline
+    python -m benchmarks.run --scale 1k --db-url postgresql+psycopg2://localhost/academic_bench
+
+Builds a temporary academic.db at the requested scale, times the planner,
+DB helpers and model, writes the results as JSON and compares the fastest
+run of each against benchmarks/baseline.json. Any benchmark slower than its
+baseline by more than --tolerance makes the run exit non-zero. Baselines are kept per
+scale and backend; see benchmarks/matrix.py to run SQLite and PostgreSQL
+back to back.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy.engine import make_url
+
+from benchmarks.fixtures import SCALES, build_db
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "min_s": samples[0],
+        "median_s": statistics.median(samples),
+        "p95_s": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "mean_s": statistics.fmean(samples),
+    }
+
+
+def per_user(fn, user_ids):
+    """Cycles through sampled users so each timed call hits a different user."""
+    it = iter(user_ids * 1000)
+    return lambda: fn(next(it))
+
+
+def cold_import(db_url):
+    env = dict(os.environ, ACADEMIC_DB_URL=db_url)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+    return elapsed
+
+
+def run_suite(db_url, users, repeat, sample_users):
+    # Imported late so they bind to ACADEMIC_DB_URL
+    from modules.goals_db import GoalsHelper
+    from modules.attendance_db import AttendanceDB
+    from modules.subjects_db import SubjectsDB
+    from modules.planner_logic import PlannerLogic
+    from ml.study_predictor import StudyHourPredictor
+
+    rng = random.Random(0)
+    user_ids = rng.sample(range(1, users + 1), min(sample_users, users))
+
+    goals_db = GoalsHelper()
+    att_db = AttendanceDB()
+    sub_db = SubjectsDB()
+    subjects = {uid: sub_db.get_subjects(uid) for uid in user_ids}
+
+    predictor = StudyHourPredictor()
+    predictor.load_model()  # make sure a model file exists before timing loads
+    planner = PlannerLogic(user_ids[0])
+
+    def plan(uid):
+        planner.user_id = uid
+        planner.generate_daily_plan(subjects[uid], class_slots_today=5)
+
+    batch = [(rng.uniform(20, 95), rng.uniform(60, 100), rng.uniform(40, 100)) for _ in range(1000)]
+
+    benches = {
+        "generate_daily_plan": per_user(plan, user_ids),
+        "get_subject_totals": per_user(goals_db.get_subject_totals, user_ids),
+        "get_scores_for_user": per_user(goals_db.get_scores_for_user, user_ids),
+        "get_attendance_percent": per_user(att_db.get_attendance_percent, user_ids),
+        "predict_single": lambda: predictor.predict_hours(55.0, 85.0, 70.0),
+        "predict_batch_1000": lambda: predictor.predict_hours_batch(batch),
+        "model_load": lambda: StudyHourPredictor().load_model(),
+    }
+
+    results = {}
+    for name, fn in benches.items():
+        fn()  # warm-up
+        results[name] = measure(fn, repeat)
+        print(f"  {name:<24} median {results[name]['median_s'] * 1000:9.3f} ms")
+
+    try:
+        samples = sorted(cold_import(db_url) for _ in range(3))
+        results["cold_app_import"] = {"runs": 3, "min_s": samples[0], "median_s": samples[1],
+                                      "p95_s": samples[2], "mean_s": statistics.fmean(samples)}
+        print(f"  {'cold_app_import':<24} median {samples[1] * 1000:9.3f} ms")
+    except RuntimeError as e:
+        print(f"  cold_app_import skipped: {e}")
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, stat in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        # min is far less sensitive to scheduler noise than the median
+        ratio = stat["min_s"] / base["min_s"] if base["min_s"] else 1.0
+        marker = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(f"  {name:<24} {ratio:6.2f}x baseline  {marker}")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--users", type=int, help="override the scale's user count")
+    parser.add_argument("--exams-per-subject", type=int, help="override the scale's exam history depth")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--sample-users", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--output", help="results JSON path (default benchmarks/results/<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--db-url", help="run against this scratch database instead of a temporary SQLite file "
+                                         "(its tables are wiped and reseeded)")
+    args = parser.parse_args(argv)
+
+    users, subjects_per_user, exams = SCALES[args.scale]
+    users = args.users or users
+    exams = args.exams_per_subject or exams
+
+    workdir = None
+    if args.db_url:
+        db_url = args.db_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="academic-bench-")
+        db_url = f"sqlite:///{os.path.join(workdir, 'academic.db')}"
+    os.environ["ACADEMIC_DB_URL"] = db_url
+    backend = make_url(db_url).get_backend_name()
+    key = args.scale if backend == "sqlite" else f"{args.scale}@{backend}"
+
+    print(f"Building {key} fixture: {users} users, {subjects_per_user} subjects, {exams} exams each")
+    start = time.perf_counter()
+    n_scores = build_db(db_url, users, subjects_per_user, exams)
+    print(f"  {n_scores} scores in {time.perf_counter() - start:.1f}s -> {make_url(db_url).render_as_string()}")
+
+    print("Running benchmarks")
+    results = run_suite(db_url, users, args.repeat, args.sample_users)
+
+    report = {
+        "scale": args.scale,
+        "backend": backend,
+        "users": users,
+        "scores": n_scores,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{key}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if workdir and not args.keep_db:
+        shutil.rmtree(workdir)
+
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[key] = {name: {"min_s": s["min_s"], "median_s": s["median_s"], "p95_s": s["p95_s"]}
+                          for name, s in results.items()}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline for {key} saved to {BASELINE_PATH}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for {key}; run with --save-baseline to create one.")
+        return 0
+
+    print(f"Comparing against baseline (tolerance {args.tolerance:.0%})")
+    regressions = compare(results, baselines[key], args.tolerance)
+    if regressions:
+        print(f"FAILED: {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
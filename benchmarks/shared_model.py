@@ -0,0 +1,94 @@
+"""
+Memory report: per-worker cost of the study-hours model, unpickled vs shared.
+
+    python -m benchmarks.shared_model
+    python -m benchmarks.shared_model --workers 8
+
+Starts --workers fresh processes per mode. In "pickle" mode each one runs
+StudyHourPredictor.load_model() normally; in "shared" mode the parent
+publishes the forest once (ml/shared_forest.py) and workers attach to it.
+Each worker reports how much private memory (USS: pages no other process
+shares) loading the model and running one prediction added, and how much of
+its resident set is shared.
+"""
+import argparse
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+MODES = ("pickle", "shared")
+
+
+def _memory():
+    """(uss, rss) in bytes from /proc/self/smaps_rollup."""
+    fields = {}
+    with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields["Private_Clean"] + fields["Private_Dirty"], fields["Rss"]
+
+
+def worker(shared_name, queue):
+    if shared_name:
+        os.environ["ACADEMIC_SHARED_MODEL"] = shared_name
+    from ml.study_predictor import StudyHourPredictor
+
+    uss_before, rss_before = _memory()
+    predictor = StudyHourPredictor()
+    predictor.load_model()
+    hours = predictor.predict_hours_batch([(55.0, 85.0, 70.0), (30.0, 90.0, 50.0)])
+    uss_after, rss_after = _memory()
+    queue.put((uss_after - uss_before, rss_after - rss_before, rss_after - uss_after, hours))
+
+
+def run_mode(ctx, shared_name, workers):
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(shared_name, queue)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("needs Linux /proc/self/smaps_rollup")
+
+    from ml.study_predictor import StudyHourPredictor
+    from ml.shared_forest import SharedForest
+
+    predictor = StudyHourPredictor()
+    predictor.load_model()
+    forest = SharedForest.publish(predictor.model)
+    ctx = mp.get_context("spawn")  # clean workers, nothing inherited from this process
+    try:
+        print(f"Model: {forest.n_trees} trees, {forest.n_nodes} nodes, "
+              f"{os.path.getsize(predictor.model_path) / 2**20:.1f} MB pickle, "
+              f"{forest._owner.size / 2**20:.1f} MB shared block")
+        print(f"{args.workers} workers per mode; memory added by load + one prediction:")
+        print(f"  {'mode':<8}{'private/worker':>16}{'rss/worker':>14}{'shared rss':>13}{'all workers':>14}")
+        answers = {}
+        for mode in MODES:
+            results = run_mode(ctx, forest.name if mode == "shared" else None, args.workers)
+            uss = np.mean([r[0] for r in results])
+            rss = np.mean([r[1] for r in results])
+            shared = np.mean([r[2] for r in results])
+            answers[mode] = results[0][3]
+            print(f"  {mode:<8}{uss / 2**20:14.1f}MB{rss / 2**20:12.1f}MB{shared / 2**20:11.1f}MB"
+                  f"{uss * args.workers / 2**20:12.1f}MB")
+        assert answers["pickle"] == answers["shared"], answers
+    finally:
+        forest.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Moves per-user rows to the shard layout ACADEMIC_SHARDS asks for.
+
+    ACADEMIC_SHARDS=4 python -m db.migrate_shards
+    python -m db.migrate_shards --shards 1     # merge the shards back into the main database
+
+Reads the main database and every shard file in ACADEMIC_SHARD_DIR, copies
+each user's rows to the database user_id % N maps to (the main database for
+N=1), deletes them where they came from, and records N in the meta table so
+the app starts again. Rows that are already in the right place are left
+alone, so it also picks up rows written to the main database after sharding
+was switched on.
+
+Ids only mean something within one database, so rows moved into a database
+that already has rows are renumbered past its highest id, together with the
+columns that point at them. Stop the app and back up the files first: each
+(source, destination) pair is copied in one transaction, but the delete on
+the source side is a second one.
+"""
+import argparse
+import glob
+import os
+import sys
+
+from sqlalchemy import create_engine, func, select
+
+from db.session import (
+    Base, SHARD_COUNT, SHARD_DIR, SessionLocal, ShardRouter, _engine_options, engine, ensure_indexes,
+    per_user_tables, record_shard_count,
+)
+
+USERS_PER_BATCH = 500   # keeps IN (...) under SQLite's bound-parameter limit
+
+# Columns holding another row's id: table -> {column: table it points into}
+REFERENCES = {
+    "plan_outcomes": {"plan_id": "plan_outcomes", "last_score_id": "scores"},
+    "score_aggregates": {"last_score_id": "scores"},
+}
+
+
+def _sources(target):
+    """The main engine plus one engine per shard file on disk, reusing the target's engines."""
+    sources = [engine]
+    for path in sorted(glob.glob(os.path.join(target.directory, "academic_*.db"))):
+        shard = os.path.basename(path)[len("academic_"):-len(".db")]
+        if shard.isdigit() and int(shard) < target.count and target.count > 1:
+            sources.append(target.engine(int(shard)))
+        else:
+            url = f"sqlite:///{path}"
+            extra = create_engine(url, echo=False, future=True, **_engine_options(url))
+            Base.metadata.create_all(bind=extra)
+            sources.append(extra)
+    return sources
+
+
+def _user_ids(conn, tables):
+    uids = set()
+    for table in tables:
+        uids.update(conn.execute(select(table.c.user_id).distinct()).scalars())
+    return sorted(uids)
+
+
+def _copy(src, dst, tables, uids):
+    """Copies `uids`' rows from src to dst, renumbering ids past dst's; returns rows copied."""
+    offsets = {t.name: dst.execute(select(func.coalesce(func.max(t.c.id), 0))).scalar()
+               for t in tables if "id" in t.c}
+    copied = 0
+    for table in tables:
+        refs = REFERENCES.get(table.name, {})
+        for i in range(0, len(uids), USERS_PER_BATCH):
+            rows = [dict(r) for r in src.execute(
+                select(table).where(table.c.user_id.in_(uids[i:i + USERS_PER_BATCH]))).mappings()]
+            if not rows:
+                continue
+            for row in rows:
+                if table.name in offsets:
+                    row["id"] += offsets[table.name]
+                for column, into in refs.items():
+                    if row[column]:   # 0 / NULL mean "none yet"
+                        row[column] += offsets[into]
+            dst.execute(table.insert(), rows)
+            copied += len(rows)
+    return copied
+
+
+def _delete(src, tables, uids):
+    for table in tables:
+        for i in range(0, len(uids), USERS_PER_BATCH):
+            src.execute(table.delete().where(table.c.user_id.in_(uids[i:i + USERS_PER_BATCH])))
+
+
+def migrate(count=SHARD_COUNT, directory=SHARD_DIR):
+    """Moves every user's rows to their shard for `count` shards; returns (users moved, rows moved)."""
+    tables = per_user_tables()
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    target = ShardRouter(count, directory, engine, SessionLocal)
+
+    users = rows = 0
+    for source in _sources(target):
+        with source.connect() as conn:
+            uids = _user_ids(conn, tables)
+        groups = {}
+        for uid in uids:
+            dest = target.engine(target.shard_of(uid))
+            if dest is not source:
+                groups.setdefault(dest, []).append(uid)
+        for dest, moving in groups.items():
+            with source.connect() as src, dest.begin() as dst:
+                rows += _copy(src, dst, tables, moving)
+            with source.begin() as src:
+                _delete(src, tables, moving)
+            users += len(moving)
+
+    with engine.begin() as conn:
+        record_shard_count(conn, target.count)
+    return users, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT, help="shard count to move to (default: ACADEMIC_SHARDS)")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    args = parser.parse_args(argv)
+
+    users, rows = migrate(args.shards, args.shard_dir)
+    print(f"✅ Moved {rows} rows of {users} users; data is now laid out for {max(1, args.shards)} shard(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
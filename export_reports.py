@@ -0,0 +1,298 @@
+"""
+Exports a per-subject academic report for every student.
+
+    python export_reports.py reports.csv
+    python export_reports.py reports.jsonl --chunk-users 2000
+    python export_reports.py reports.parquet --no-plan
+
+One row per (user, subject): target, score totals and history, attendance
+and today's recommended study hours, with planned_by naming the agent that
+answered; like generate_daily_plan, each student's available hours come from
+their own timetable for the day. Users are walked in keyset-paginated chunks
+(WHERE id > last_id ORDER BY id LIMIT n); score history is streamed with
+yield_per, and every chunk is written out before the next one is read, so
+memory stays flat no matter how many students there are. With
+ACADEMIC_SHARDS set, each chunk is read from its shards in parallel.
+
+Format is picked from the file extension (.csv, .jsonl, .parquet); use "-"
+with --format to write CSV or JSONL to stdout. Parquet needs pyarrow.
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import text
+
+from db.session import get_session, stream, router
+from modules.attendance_db import EFFECTIVE_ATTENDANCE
+from modules.retention import EXAM_ROWS
+from modules.planner_logic import (
+    boost_weak_subjects, class_slots_on, estimate_available_study_hours, scale_to_available,
+    DEFAULT_SCORE, DEFAULT_ATTENDANCE, DEFAULT_TARGET,
+)
+from ml.performance_predictor import PerformancePredictor
+from ml.agents import default_registry, DEFAULT_AGENT
+
+COLUMNS = [
+    "user_id", "username", "name", "subject", "target_score", "score_pct", "total_score",
+    "total_max", "exam_count", "attendance_pct", "planned_hours", "planned_by", "score_history",
+]
+HISTORY_YIELD_PER = 5000
+
+
+# ---------------------------------------------------------
+# READING
+# ---------------------------------------------------------
+
+def _rows_by_user(session, query, params):
+    grouped = defaultdict(list)
+    for row in session.execute(text(query), params):
+        grouped[row[0]].append(row[1:])
+    return grouped
+
+
+def iter_user_chunks(session, chunk_users):
+    """Keyset pagination over users; yields lists of (id, username, name)."""
+    last_id = 0
+    while True:
+        users = session.execute(text("""
+            SELECT id, username, name FROM users
+            WHERE id > :last ORDER BY id LIMIT :n
+        """), {"last": last_id, "n": chunk_users}).fetchall()
+        if not users:
+            return
+        yield users
+        last_id = users[-1][0]
+
+
+def load_chunk(session, lo, hi):
+    """Bulk-reads everything the report needs for users with lo <= id <= hi."""
+    params = {"lo": lo, "hi": hi}
+    subjects = _rows_by_user(session, """
+        SELECT user_id, subject FROM subjects
+        WHERE user_id BETWEEN :lo AND :hi ORDER BY user_id, id
+    """, params)
+    targets = _rows_by_user(session, """
+        SELECT user_id, subject, target_score FROM subject_goals
+        WHERE user_id BETWEEN :lo AND :hi ORDER BY user_id, id
+    """, params)
+    # Rollups count towards the sums but are not exams; score_history keeps them so it adds up to the totals
+    totals = _rows_by_user(session, f"""
+        SELECT user_id, subject, SUM(score), SUM(max_score), SUM(CASE WHEN {EXAM_ROWS} THEN 1 ELSE 0 END) FROM scores
+        WHERE user_id BETWEEN :lo AND :hi GROUP BY user_id, subject
+    """, params)
+    attendance = _rows_by_user(session, f"""
+        SELECT user_id, subject, percentage FROM {EFFECTIVE_ATTENDANCE} a
+        WHERE user_id BETWEEN :lo AND :hi
+    """, params)
+
+    # Filled timetable slots per weekday, as TimetableDB.count_filled_slots_by_weekday counts them
+    class_load = _rows_by_user(session, """
+        SELECT user_id, weekday, COUNT(id) FROM timetable
+        WHERE user_id BETWEEN :lo AND :hi AND subject IS NOT NULL AND subject != ''
+        GROUP BY user_id, weekday
+    """, params)
+
+    history = defaultdict(lambda: defaultdict(list))
+    result = stream(session, text("""
+        SELECT user_id, subject, exam_name, score, max_score, date FROM scores
+        WHERE user_id BETWEEN :lo AND :hi ORDER BY user_id, subject, date
+    """), params, yield_per=HISTORY_YIELD_PER)
+    for uid, subj, exam, score, max_score, day in result:
+        history[uid][subj].append({"exam": exam, "score": score, "max_score": max_score, "date": str(day)})
+
+    return subjects, targets, totals, attendance, class_load, history
+
+
+def load_sharded_chunk(users):
+    """load_chunk() on every shard holding users of this chunk, merged."""
+    parts = router.fan_out(lambda session, uids: load_chunk(session, min(uids), max(uids)), [u[0] for u in users])
+    merged = parts[0]
+    for part in parts[1:]:
+        for into, more in zip(merged, part):
+            into.update(more)  # keyed by user id, and no user is on two shards
+    return merged
+
+
+# ---------------------------------------------------------
+# BUILDING ROWS
+# ---------------------------------------------------------
+
+def build_rows(users, chunk, weekday):
+    """Plans for `weekday` (0 = Monday) from each user's timetable; weekday=None skips plan computation."""
+    subjects, targets, totals, attendance, class_load, history = chunk
+    with_plan = weekday is not None
+    # Weak-subject flags for the whole chunk in one cohort call
+    weak = PerformancePredictor().weak_subjects([u[0] for u in users]) if with_plan else {}
+
+    per_user = []
+    batch = []
+    for uid, username, name in users:
+        # Oldest row wins on duplicates, like GoalsHelper.get_subject_targets
+        target_map = {}
+        for s, t in targets.get(uid, []):
+            target_map.setdefault(s, t)
+        att_map = {s: p for s, p in attendance.get(uid, [])}
+        total_map = {}
+        for subj, total_score, total_max, count in totals.get(uid, []):
+            # Same rounding as GoalsHelper.get_subject_totals
+            pct = round((float(total_score) / float(total_max)) * 100, 2) if total_max and total_score is not None else 0
+            total_map[subj] = (pct, total_score, total_max, count)
+
+        subj_list = list(dict.fromkeys(s for (s,) in subjects.get(uid, [])))
+        per_user.append((uid, username, name, subj_list, target_map, att_map, total_map))
+        for subj in subj_list:
+            batch.append({
+                "current_score": total_map[subj][0] if subj in total_map else DEFAULT_SCORE,
+                "target_score": target_map.get(subj) or DEFAULT_TARGET,
+                "attendance": att_map.get(subj, DEFAULT_ATTENDANCE),
+            })
+
+    # One agent call for the whole chunk; a batch job waits for the model rather than falling back on a deadline
+    hours, planned_by = default_registry.predict(DEFAULT_AGENT, batch, budgeted=False) if with_plan else ([], None)
+    predictions = iter(hours)
+
+    for uid, username, name, subj_list, target_map, att_map, total_map in per_user:
+        plan = {}
+        if with_plan and subj_list:
+            raw = {s: next(predictions) for s in subj_list}
+            available_hours = estimate_available_study_hours(class_slots_on(dict(class_load.get(uid, [])), weekday))
+            plan = scale_to_available(boost_weak_subjects(raw, weak.get(uid, {})), available_hours)
+
+        if not subj_list:
+            yield dict.fromkeys(COLUMNS) | {"user_id": uid, "username": username, "name": name, "score_history": []}
+            continue
+
+        for subj in subj_list:
+            pct, total_score, total_max, count = total_map.get(subj, (None, None, None, 0))
+            yield {
+                "user_id": uid,
+                "username": username,
+                "name": name,
+                "subject": subj,
+                "target_score": target_map.get(subj),
+                "score_pct": pct,
+                "total_score": total_score,
+                "total_max": total_max,
+                "exam_count": count,
+                "attendance_pct": att_map.get(subj),
+                "planned_hours": plan.get(subj),
+                "planned_by": planned_by if plan else None,
+                "score_history": history[uid].get(subj, []),
+            }
+
+
+# ---------------------------------------------------------
+# WRITERS
+# ---------------------------------------------------------
+
+class CsvReportWriter:
+    def __init__(self, out):
+        self.writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            self.writer.writerow(row | {"score_history": json.dumps(row["score_history"])})
+
+    def close(self):
+        pass
+
+
+class JsonlReportWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, rows):
+        for row in rows:
+            self.out.write(json.dumps(row) + "\n")
+
+    def close(self):
+        pass
+
+
+class ParquetReportWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+
+        self.pa = pa
+        history_type = pa.list_(pa.struct([
+            ("exam", pa.string()), ("score", pa.float64()), ("max_score", pa.float64()), ("date", pa.string()),
+        ]))
+        self.schema = pa.schema([
+            ("user_id", pa.int64()), ("username", pa.string()), ("name", pa.string()),
+            ("subject", pa.string()), ("target_score", pa.float64()), ("score_pct", pa.float64()),
+            ("total_score", pa.float64()), ("total_max", pa.float64()), ("exam_count", pa.int64()),
+            ("attendance_pct", pa.float64()), ("planned_hours", pa.float64()), ("planned_by", pa.string()),
+            ("score_history", history_type),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        # One row group per chunk
+        rows = list(rows)
+        if rows:
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, fmt):
+    if fmt == "parquet":
+        if path == "-":
+            raise SystemExit("Parquet output needs a file path")
+        return ParquetReportWriter(path), None
+    out = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    writer = CsvReportWriter(out) if fmt == "csv" else JsonlReportWriter(out)
+    return writer, (None if out is sys.stdout else out)
+
+
+def export(path, fmt, chunk_users=1000, with_plan=True):
+    weekday = None
+    if with_plan:
+        default_registry.get(DEFAULT_AGENT)  # load up front rather than against the first chunk
+        weekday = date.today().weekday()
+
+    writer, handle = open_writer(path, fmt)
+    exported = 0
+    session = get_session()
+    try:
+        for users in iter_user_chunks(session, chunk_users):
+            chunk = load_sharded_chunk(users)
+            writer.write(build_rows(users, chunk, weekday))
+            exported += len(users)
+            print(f"  exported {exported} users", file=sys.stderr)
+    finally:
+        session.close()
+        writer.close()
+        if handle:
+            handle.close()
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="output file (.csv, .jsonl, .parquet) or - for stdout")
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--chunk-users", type=int, default=1000, help="users read and written per batch")
+    parser.add_argument("--no-plan", action="store_true", help="skip computing today's plan")
+    args = parser.parse_args()
+
+    fmt = args.format or args.output.rsplit(".", 1)[-1].lower()
+    if fmt not in ("csv", "jsonl", "parquet"):
+        parser.error("cannot infer format from file name; pass --format")
+
+    n = export(args.output, fmt, args.chunk_users, not args.no_plan)
+    print(f"✅ Exported reports for {n} users", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Plugin registry for the planner's ML decision agents.
+
+Agents are registered by import path and declare the features they need.
+Nothing is imported or loaded until an agent is first used, and every call
+runs under a latency budget: if an agent is still loading, fails to load or
+is too slow, the registry answers with the cheap heuristic agent instead so
+the planner's tail latency stays bounded as agents are added. A failed load
+is retried once LOAD_RETRY_S has passed, so a model file caught mid-swap by
+the retrainer doesn't pin the process to the fallback.
+
+    registry.register("my_agent", "ml.my_module:MyAgent",
+                      inputs=("current_score", "target_score"), budget_ms=100)
+
+An agent class needs load() and predict_batch(rows) -> list of hours, where
+each row is a tuple ordered like its declared inputs.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from modules import metrics
+
+log = logging.getLogger(__name__)
+
+FALLBACK_AGENT = "heuristic"
+DEFAULT_AGENT = os.environ.get("ACADEMIC_PLANNER_AGENT", "study_hours")
+LOAD_RETRY_S = 30   # how long a failed load is remembered before the next call tries again
+
+
+# ---------------------------------------------------------
+# BUILT-IN AGENTS
+# ---------------------------------------------------------
+
+class HeuristicAgent:
+    """The rule the training data was generated from (see dataset_generator.py), minus the noise."""
+
+    def load(self):
+        pass
+
+    def predict_batch(self, rows):
+        result = []
+        for current, target, attendance in rows:
+            hours = max(0, target - current) / 10
+            if current < 40:
+                hours += 2.5
+            elif current < 60:
+                hours += 1.5
+            if attendance < 60:
+                hours += 1.0
+            result.append(round(max(0.5, min(6.0, hours)), 2))
+        return result
+
+
+class StudyHoursAgent:
+    """The random-forest StudyHourPredictor."""
+
+    def __init__(self):
+        self.predictor = None
+
+    def load(self):
+        from ml.study_predictor import StudyHourPredictor
+        predictor = StudyHourPredictor()
+        predictor.load_model()
+        self.predictor = predictor
+
+    def predict_batch(self, rows):
+        return self.predictor.predict_hours_batch(rows)
+
+
+# ---------------------------------------------------------
+# REGISTRY
+# ---------------------------------------------------------
+
+class AgentSpec:
+    def __init__(self, name, target, inputs, budget_ms, load_budget_ms):
+        self.name = name
+        self.target = target              # "package.module:ClassName"
+        self.inputs = tuple(inputs)
+        self.budget_ms = budget_ms        # None = run inline without a deadline
+        self.load_budget_ms = load_budget_ms
+        self.instance = None
+        self.error = None
+        self.failed_at = None             # time.monotonic() of the last failed load
+        self.loading = None               # Future while a background load is running
+
+
+class AgentRegistry:
+    def __init__(self, max_workers=4):
+        self._specs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+
+    def register(self, name, target, inputs, budget_ms=250, load_budget_ms=3000):
+        with self._lock:
+            self._specs[name] = AgentSpec(name, target, inputs, budget_ms, load_budget_ms)
+
+    def names(self):
+        return list(self._specs)
+
+    def inputs(self, name):
+        return self._specs[name].inputs
+
+    @staticmethod
+    def _load(spec):
+        start = time.perf_counter()
+        with metrics.timer(f"agents.load.{spec.name}"):
+            try:
+                module_name, _, attr = spec.target.partition(":")
+                agent = getattr(importlib.import_module(module_name), attr)()
+                agent.load()
+                spec.instance = agent
+            except Exception as e:
+                spec.error = e
+                spec.failed_at = time.monotonic()
+                log.warning("Agent %s failed to load: %s", spec.name, e)
+                raise
+        log.info("Loaded agent %s in %.0f ms", spec.name, (time.perf_counter() - start) * 1000)
+
+    @staticmethod
+    def _backing_off(spec):
+        return spec.error is not None and time.monotonic() - spec.failed_at < LOAD_RETRY_S
+
+    def warm(self, name):
+        """Starts loading an agent in the background, returns immediately."""
+        spec = self._specs[name]
+        with self._lock:
+            if spec.instance is not None or self._backing_off(spec):
+                return spec.loading
+            if spec.error is not None:   # the backoff has passed: forget the failure and load again
+                spec.error = spec.loading = None
+            if spec.loading is None:
+                spec.loading = self._executor.submit(self._load, spec)
+            return spec.loading
+
+    def get(self, name, timeout=None):
+        """Returns the loaded agent, waiting up to `timeout` seconds for it to load."""
+        spec = self._specs[name]
+        if spec.instance is not None:
+            return spec.instance
+        if self._backing_off(spec):
+            raise spec.error
+        future = self.warm(name)
+        future.result(timeout=timeout)
+        return spec.instance
+
+    def loaded(self, name):
+        """The agent if it is already loaded, else None; never starts a load."""
+        return self._specs[name].instance
+
+    def set_instance(self, name, agent):
+        """Installs an already-loaded agent (e.g. one shared by a server or a test)."""
+        self._specs[name].instance = agent
+
+    def predict(self, name, features, fallback=FALLBACK_AGENT, budgeted=True):
+        """
+        features: list of dicts holding at least the agent's declared inputs.
+        Returns (hours list, name of the agent that answered).
+        budgeted=False is for batch jobs: wait for the load and run the
+        prediction on the calling thread, without the interactive latency budgets.
+        """
+        spec = self._specs[name]
+        rows = [tuple(f[k] for k in spec.inputs) for f in features]
+        if not rows:
+            return [], name
+
+        try:
+            load_timeout = None if spec.load_budget_ms is None or not budgeted else spec.load_budget_ms / 1000
+            agent = self.get(name, timeout=load_timeout)
+            if spec.budget_ms is None or not budgeted:
+                return agent.predict_batch(rows), name
+            future = self._executor.submit(agent.predict_batch, rows)
+            return future.result(timeout=spec.budget_ms / 1000), name
+        except FutureTimeout:
+            log.warning("Agent %s exceeded its latency budget, using %s", name, fallback)
+        except Exception as e:
+            log.warning("Agent %s failed (%s), using %s", name, e, fallback)
+
+        if fallback is None or fallback == name:
+            raise RuntimeError(f"agent {name} unavailable and no fallback configured")
+        with metrics.timer(f"agents.fallback.{name}"):
+            return self.predict(fallback, features, fallback=None)[0], fallback
+
+
+PLANNER_INPUTS = ("current_score", "target_score", "attendance")
+
+default_registry = AgentRegistry()
+default_registry.register("study_hours", "ml.agents:StudyHoursAgent", inputs=PLANNER_INPUTS,
+                          budget_ms=250, load_budget_ms=3000)
+default_registry.register(FALLBACK_AGENT, "ml.agents:HeuristicAgent", inputs=PLANNER_INPUTS,
+                          budget_ms=None, load_budget_ms=None)
@@ -0,0 +1,182 @@
+"""
+Cohort-wide performance analysis and weak-subject detection.
+
+Everything is computed for all (user, subject) pairs of a cohort at once:
+scores and attendance are pulled with one query each, then score trends,
+recent-vs-historical deltas and attendance risk come from grouped NumPy
+reductions (np.bincount over a group code) instead of per-user loops.
+Retention rollup rows count towards the overall score percentage only; exam
+counts, trends and recent-vs-historical deltas use real exams.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from db.session import router
+from modules.metrics import timed
+from modules.attendance_db import EFFECTIVE_ATTENDANCE
+from modules.retention import EXAM_ROWS
+
+RECENT_EXAMS = 3            # exams counted as "recent" for the delta
+WEAK_SCORE_PCT = 50.0       # overall percentage below this is weak
+DECLINE_PER_30D = -5.0      # trend (percentage points per 30 days) at or below this is declining
+RECENT_DROP_PCT = -10.0     # recent average this far below the historical one
+MIN_ATTENDANCE = 75.0       # attendance below this is a risk
+MIN_TREND_EXAMS = 3         # need at least this many exams before trusting a slope
+
+COLUMNS = [
+    "user_id", "subject", "exams", "score_pct", "slope_per_30d", "recent_pct", "historical_pct",
+    "recent_delta", "projected_pct", "attendance_pct", "attendance_risk", "weak", "reasons",
+]
+
+
+def _group_mean(codes, values, n_groups, mask=None):
+    if mask is not None:
+        codes, values = codes[mask], values[mask]
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+class PerformancePredictor:
+    def _cohort_filter(self, user_ids):
+        if user_ids is None:
+            return "", {}
+        return "WHERE user_id IN :uids", {"uids": [int(u) for u in user_ids]}
+
+    def _query(self, sql, user_ids):
+        def read(session, shard_user_ids):
+            where, params = self._cohort_filter(shard_user_ids)
+            stmt = text(sql.format(where=where))
+            if params:
+                stmt = stmt.bindparams(bindparam("uids", expanding=True))
+            return pd.read_sql_query(stmt, session.connection(), params=params)
+
+        # One query per shard, in parallel
+        frames = router.fan_out(read, user_ids)
+        if len(frames) == 1:
+            return frames[0]
+        # A user lives on exactly one shard, so a stable sort by user keeps each user's row order
+        return pd.concat(frames, ignore_index=True).sort_values("user_id", kind="stable", ignore_index=True)
+
+    def load_scores(self, user_ids=None):
+        df = self._query("""
+            SELECT user_id, subject, date, score, max_score, """ + EXAM_ROWS + """ AS is_exam FROM scores
+            {where}
+            ORDER BY user_id, subject, date, id
+        """, user_ids)
+        df["date"] = pd.to_datetime(df["date"])
+        df["is_exam"] = df["is_exam"].astype(bool)
+        return df
+
+    def load_attendance(self, user_ids=None):
+        return self._query(
+            "SELECT user_id, subject, percentage FROM " + EFFECTIVE_ATTENDANCE + " a {where}", user_ids
+        )
+
+    def trends(self, scores):
+        """
+        Per-(user, subject) score statistics. `scores` must be sorted by user, subject, date;
+        rows with is_exam False (retention rollups) only count towards score_pct.
+        """
+        if scores.empty:
+            return pd.DataFrame(columns=COLUMNS[:9])
+
+        codes, keys = pd.factorize(pd.MultiIndex.from_arrays([scores["user_id"], scores["subject"]]))
+        g = len(keys)
+
+        score = scores["score"].to_numpy(dtype=float)
+        max_score = scores["max_score"].to_numpy(dtype=float)
+        total = np.bincount(codes, weights=score, minlength=g)
+        total_max = np.bincount(codes, weights=max_score, minlength=g)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            score_pct = np.where(total_max > 0, total / total_max * 100, 0.0)
+
+        # Everything below is per exam, so rollups drop out here; groups stay contiguous
+        if "is_exam" in scores:
+            exam = scores["is_exam"].to_numpy(dtype=bool)
+            codes, score, max_score = codes[exam], score[exam], max_score[exam]
+            scores = scores[exam]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = np.where(max_score > 0, score / max_score * 100, np.nan)
+        valid = ~np.isnan(pct)
+        days = (scores["date"] - scores["date"].min()).dt.days.to_numpy(dtype=float)
+
+        n = np.bincount(codes, minlength=g)
+
+        # Least-squares slope of pct over time, per group
+        c, x, y = codes[valid], days[valid], pct[valid]
+        nv = np.bincount(c, minlength=g)
+        sx = np.bincount(c, weights=x, minlength=g)
+        sy = np.bincount(c, weights=y, minlength=g)
+        sxx = np.bincount(c, weights=x * x, minlength=g)
+        sxy = np.bincount(c, weights=x * y, minlength=g)
+        denom = nv * sxx - sx * sx
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = np.where((nv >= MIN_TREND_EXAMS) & (denom > 0), (nv * sxy - sx * sy) / denom, 0.0)
+            mean_x = sx / nv
+            mean_y = sy / nv
+
+        # Last observed day per group, then project 30 days past it along the trend
+        last_day = np.full(g, -np.inf)
+        np.maximum.at(last_day, c, x)
+        projected = np.clip(mean_y + slope * (last_day + 30 - mean_x), 0, 100)
+
+        # Position from the end of each group (rows are date-sorted within a group)
+        starts = np.zeros(g, dtype=np.int64)
+        starts[1:] = np.cumsum(n)[:-1]
+        from_end = n[codes] - 1 - (np.arange(len(codes)) - starts[codes])
+        recent = valid & (from_end < RECENT_EXAMS)
+        historical = valid & (from_end >= RECENT_EXAMS)
+        recent_pct = _group_mean(codes, np.nan_to_num(pct), g, recent)
+        historical_pct = _group_mean(codes, np.nan_to_num(pct), g, historical)
+
+        return pd.DataFrame({
+            "user_id": keys.get_level_values(0),
+            "subject": keys.get_level_values(1),
+            "exams": n,
+            "score_pct": np.round(score_pct, 2),
+            "slope_per_30d": np.round(slope * 30, 2),
+            "recent_pct": np.round(recent_pct, 2),
+            "historical_pct": np.round(historical_pct, 2),
+            "recent_delta": np.round(recent_pct - historical_pct, 2),
+            "projected_pct": np.round(projected, 2),
+        })
+
+    @timed("ml.analyze_cohort")
+    def analyze_cohort(self, user_ids=None):
+        """
+        One row per (user_id, subject) with trend, attendance risk and a weak flag.
+        user_ids=None analyzes every user.
+        """
+        stats = self.trends(self.load_scores(user_ids))
+        att = self.load_attendance(user_ids).rename(columns={"percentage": "attendance_pct"})
+        df = stats.merge(att, on=["user_id", "subject"], how="outer")
+        if df.empty:
+            return pd.DataFrame(columns=COLUMNS)
+
+        df["exams"] = df["exams"].fillna(0).astype(int)
+        att_pct = df["attendance_pct"].to_numpy(dtype=float)
+        df["attendance_risk"] = np.round(np.clip((MIN_ATTENDANCE - att_pct) / MIN_ATTENDANCE, 0, 1), 3)
+        df["attendance_risk"] = df["attendance_risk"].fillna(0.0)
+
+        # score_pct is NaN for attendance-only subjects; rollup-only ones still have one
+        low = df["score_pct"] < WEAK_SCORE_PCT
+        declining = df["slope_per_30d"] <= DECLINE_PER_30D
+        dropping = df["recent_delta"] <= RECENT_DROP_PCT
+        absent = df["attendance_risk"] > 0
+
+        flags = np.column_stack([low, declining, dropping, absent])
+        labels = np.array(["low score", "declining trend", "recent drop", "low attendance"])
+        df["weak"] = flags.any(axis=1)
+        df["reasons"] = [labels[row].tolist() for row in flags]
+        return df[COLUMNS].sort_values(["user_id", "subject"], ignore_index=True)
+
+    def weak_subjects(self, user_ids=None):
+        """Returns {user_id: {subject: [reasons]}} for every flagged subject in the cohort."""
+        df = self.analyze_cohort(user_ids)
+        result = {}
+        for uid, subj, reasons in df.loc[df["weak"], ["user_id", "subject", "reasons"]].itertuples(index=False):
+            result.setdefault(int(uid), {})[subj] = reasons
+        return result
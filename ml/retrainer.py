@@ -0,0 +1,229 @@
+"""
+Background retraining of the study-hours model from real outcomes.
+
+Plans the planner makes are logged in plan_outcomes (modules/outcomes_db.py);
+once a later exam shows how the student actually did, an outcome row with a
+corrected hours label is appended. The Retrainer periodically:
+
+  1. resolves open plans on every shard,
+  2. collects outcomes newer than the last retrain, of plans the model itself
+     made (not ones the heuristic fallback answered),
+  3. warm-starts the current forest with NEW_TREES extra trees fitted on them
+     (plus a replay sample of the base dataset so the new trees stay sane);
+     past MAX_TREES the oldest outcome trees go, the base forest always stays,
+  4. validates against the base hold-out and held-back outcomes,
+  5. writes the model next to the old one and swaps it in with os.replace,
+     then points the live StudyHoursAgent's predictor at it.
+
+Everything runs on a daemon thread; planning keeps using the old model until
+the reference is swapped.
+
+    python -m ml.retrainer            # one pass, then exit
+"""
+import json
+import logging
+import os
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from db.session import router
+from modules import metrics
+from modules.outcomes_db import OutcomesDB
+from ml.study_predictor import StudyHourPredictor
+
+log = logging.getLogger(__name__)
+
+MIN_BATCH = 50             # outcomes needed before a retrain is worth it
+NEW_TREES = 20             # trees added per retrain
+MAX_TREES = 300            # oldest outcome-fitted trees are dropped past this
+REPLAY_ROWS = 500          # base-dataset rows mixed into each batch
+HOLDOUT_SHARE = 0.2        # outcomes held back for validation
+MAX_BASE_DEGRADATION = 1.10  # new MAE on the base hold-out may be at most 10% worse
+FEATURES = ["current_score", "target_score", "gap", "attendance"]
+
+
+def _frame(rows):
+    """rows: (current_score, target_score, attendance, hours)."""
+    arr = np.asarray(rows, dtype=float).reshape(-1, 4)
+    return pd.DataFrame({
+        "current_score": arr[:, 0],
+        "target_score": arr[:, 1],
+        "gap": np.maximum(0, arr[:, 1] - arr[:, 0]),
+        "attendance": arr[:, 2],
+    }), arr[:, 3]
+
+
+def _trim(model):
+    """
+    Caps the forest at MAX_TREES by dropping the oldest outcome-fitted trees.
+    The first n_base_trees_ trees (the forest train_model built) are kept, and
+    so is at least the newest batch.
+    """
+    base = model.n_base_trees_
+    room = max(MAX_TREES - base, NEW_TREES)
+    if len(model.estimators_) > base + room:
+        model.estimators_ = model.estimators_[:base] + model.estimators_[-room:]
+        model.set_params(n_estimators=len(model.estimators_))
+
+
+def _mae(model, X, y):
+    return float(np.mean(np.abs(model.predict(X) - y))) if len(y) else 0.0
+
+
+class Retrainer:
+    def __init__(self, predictor_path=None, interval_s=3600, registry=None, agent="study_hours"):
+        base = StudyHourPredictor()
+        self.model_path = predictor_path or base.model_path
+        self.data_path = base.data_path
+        self.state_path = os.path.splitext(self.model_path)[0] + ".retrain.json"
+        self.interval_s = interval_s
+        self.registry = registry
+        self.agent = agent
+        self.outcomes = OutcomesDB()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ---------------------------------------------------------
+    # STATE
+    # ---------------------------------------------------------
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"trained_through": {}, "retrains": 0}
+
+    def _save_state(self, state):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    # ---------------------------------------------------------
+    # ONE PASS
+    # ---------------------------------------------------------
+
+    def _collect(self, trained_through):
+        def per_shard(session, _):
+            shard = session.get_bind().url.database  # the shard's file, stable across runs
+            self.outcomes.resolve(session)
+            return shard, self.outcomes.training_rows(session, trained_through.get(shard, 0), self.agent)
+
+        batch, newest = [], {}
+        for shard, rows in router.fan_out(per_shard):
+            if rows:
+                newest[shard] = rows[-1][0]
+                batch.extend(tuple(r[1:]) for r in rows)
+        return batch, newest
+
+    def _base_split(self):
+        from sklearn.model_selection import train_test_split
+        df = pd.read_csv(self.data_path)
+        # Same split as StudyHourPredictor.train_model, so the hold-out was never trained on
+        train, test = train_test_split(df, test_size=0.2, random_state=42)
+        return train, test
+
+    def run_once(self):
+        """Returns True if a new model was swapped in."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            with metrics.timer("ml.retrain"):
+                return self._run_once()
+        finally:
+            self._lock.release()
+
+    def _run_once(self):
+        state = self._load_state()
+        batch, newest = self._collect(state["trained_through"])
+        if len(batch) < MIN_BATCH:
+            log.info("Retrain skipped: %d new outcomes (need %d)", len(batch), MIN_BATCH)
+            return False
+
+        rng = np.random.default_rng(len(batch) + state["retrains"])
+        order = rng.permutation(len(batch))
+        n_hold = max(1, int(len(batch) * HOLDOUT_SHARE))
+        X_hold, y_hold = _frame([batch[i] for i in order[:n_hold]])
+        X_new, y_new = _frame([batch[i] for i in order[n_hold:]])
+
+        base_train, base_test = self._base_split()
+        replay = base_train.sample(min(REPLAY_ROWS, len(base_train)), random_state=int(rng.integers(1 << 31)))
+        X_fit = pd.concat([X_new, replay[FEATURES]], ignore_index=True)
+        y_fit = np.concatenate([y_new, replay["recommended_hours"].to_numpy()])
+
+        current = joblib.load(self.model_path)
+        candidate = joblib.load(self.model_path)
+        # A model straight from train_model has only base trees; the count travels with the file
+        candidate.n_base_trees_ = getattr(candidate, "n_base_trees_", len(candidate.estimators_))
+        candidate.set_params(warm_start=True, n_estimators=len(candidate.estimators_) + NEW_TREES)
+        candidate.fit(X_fit, y_fit)  # warm_start: keeps the old trees, fits only the new ones
+        _trim(candidate)
+
+        X_base, y_base = base_test[FEATURES], base_test["recommended_hours"].to_numpy()
+        old_base, new_base = _mae(current, X_base, y_base), _mae(candidate, X_base, y_base)
+        old_hold, new_hold = _mae(current, X_hold, y_hold), _mae(candidate, X_hold, y_hold)
+        if new_base > old_base * MAX_BASE_DEGRADATION or new_hold > old_hold:
+            log.warning("Retrain rejected: base MAE %.3f -> %.3f, outcome MAE %.3f -> %.3f",
+                        old_base, new_base, old_hold, new_hold)
+            return False
+
+        # Write beside the live file, then rename over it: readers see the old or the new model, never half of one
+        tmp = self.model_path + ".tmp"
+        joblib.dump(candidate, tmp)
+        os.replace(tmp, self.model_path)
+        self._swap(candidate)
+
+        state["trained_through"].update(newest)
+        state["retrains"] += 1
+        self._save_state(state)
+        log.info("Retrained on %d outcomes: base MAE %.3f -> %.3f, outcome MAE %.3f -> %.3f",
+                 len(batch), old_base, new_base, old_hold, new_hold)
+        return True
+
+    def _swap(self, model):
+        """Points the running StudyHoursAgent at the new model (one reference assignment)."""
+        if self.registry is None:
+            return
+        agent = self.registry.loaded(self.agent)
+        if agent is None:
+            return  # not loaded in this process; it will read the new file when it is
+        predictor = getattr(agent, "predictor", None)
+        if predictor is not None and hasattr(predictor.model, "estimators_"):
+            predictor.model = model
+
+    # ---------------------------------------------------------
+    # BACKGROUND THREAD
+    # ---------------------------------------------------------
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.run_once()
+            except Exception as e:
+                log.warning("Retrain failed: %s", e)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="retrainer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_background(registry=None):
+    """Starts periodic retraining every ACADEMIC_RETRAIN_INTERVAL seconds (0 or unset: off)."""
+    interval = float(os.environ.get("ACADEMIC_RETRAIN_INTERVAL", 0))
+    if interval <= 0:
+        return None
+    return Retrainer(interval_s=interval, registry=registry).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    swapped = Retrainer().run_once()
+    print("✅ Model retrained" if swapped else "No new model")
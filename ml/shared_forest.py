@@ -0,0 +1,176 @@
+"""
+The study-hours random forest as flat arrays in shared memory.
+
+A parent process publishes the fitted forest's node arrays once; worker
+processes attach to them read-only and predict with a NumPy traversal, so
+they never unpickle the model or hold their own copy of the trees (and
+don't even need scikit-learn imported).
+
+    forest = SharedForest.publish(predictor.model)        # parent, keeps it alive
+    os.environ["ACADEMIC_SHARED_MODEL"] = forest.name     # inherited by workers
+    ...
+    predictor.load_model()   # in a worker: attaches instead of unpickling
+
+The same layout can be written to a file and memory-mapped with
+SharedForest.save() / SharedForest.open().
+
+SharedForest.predict() takes the same feature matrix as the sklearn model and
+gives identical results: inputs are cast to float32 like sklearn does before
+comparing against the float64 thresholds.
+"""
+import mmap
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+MAGIC = 0x53464F52455354  # "SFOREST"
+HEADER = 6                # int64s: magic, n_trees, n_nodes, n_features, max_depth, reserved
+
+# (name, dtype, length as a function of (n_trees, n_nodes))
+ARRAYS = (
+    ("roots", np.int64, lambda t, n: t),
+    ("left", np.int64, lambda t, n: n),
+    ("right", np.int64, lambda t, n: n),
+    ("feature", np.int64, lambda t, n: n),
+    ("threshold", np.float64, lambda t, n: n),
+    ("value", np.float64, lambda t, n: n),
+)
+
+
+def _layout(n_trees, n_nodes):
+    offset = HEADER * 8
+    spans = {}
+    for name, dtype, length in ARRAYS:
+        size = length(n_trees, n_nodes) * np.dtype(dtype).itemsize
+        spans[name] = (offset, length(n_trees, n_nodes), dtype)
+        offset += size
+    return spans, offset
+
+
+def _flatten(model):
+    """Concatenates every tree's node arrays, rebasing child indices."""
+    trees = [est.tree_ for est in model.estimators_]
+    counts = [t.node_count for t in trees]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+    def rebase(children, start):
+        children = children.astype(np.int64)
+        return np.where(children < 0, -1, children + start)
+
+    return {
+        "roots": starts,
+        "left": np.concatenate([rebase(t.children_left, s) for t, s in zip(trees, starts)]),
+        "right": np.concatenate([rebase(t.children_right, s) for t, s in zip(trees, starts)]),
+        "feature": np.concatenate([t.feature.astype(np.int64) for t in trees]),
+        "threshold": np.concatenate([t.threshold for t in trees]),
+        "value": np.concatenate([t.value[:, 0, 0] for t in trees]),
+    }, max(t.max_depth for t in trees), model.n_features_in_
+
+
+class SharedForest:
+    def __init__(self, buf, owner=None, name=None):
+        header = np.frombuffer(buf, dtype=np.int64, count=HEADER)
+        if header[0] != MAGIC:
+            raise ValueError("not a shared forest")
+        self.n_trees, self.n_nodes, self.n_features, self.max_depth = (int(x) for x in header[1:5])
+        spans, _ = _layout(self.n_trees, self.n_nodes)
+        for key, (offset, length, dtype) in spans.items():
+            arr = np.frombuffer(buf, dtype=dtype, count=length, offset=offset)
+            arr.flags.writeable = False
+            setattr(self, key, arr)
+        self.name = name
+        self._owner = owner   # SharedMemory / mmap keeping the buffer alive
+
+    # ---------------------------------------------------------
+    # PUBLISH / ATTACH
+    # ---------------------------------------------------------
+
+    @staticmethod
+    def _write(buf, model):
+        arrays, max_depth, n_features = _flatten(model)
+        n_trees, n_nodes = len(arrays["roots"]), len(arrays["left"])
+        np.frombuffer(buf, dtype=np.int64, count=HEADER)[:] = (MAGIC, n_trees, n_nodes, n_features, max_depth, 0)
+        spans, _ = _layout(n_trees, n_nodes)
+        for key, (offset, length, dtype) in spans.items():
+            np.frombuffer(buf, dtype=dtype, count=length, offset=offset)[:] = arrays[key]
+
+    @staticmethod
+    def _size(model):
+        return _layout(len(model.estimators_), sum(e.tree_.node_count for e in model.estimators_))[1]
+
+    @classmethod
+    def publish(cls, model, name=None):
+        """Copies a fitted RandomForestRegressor into a new shared memory block."""
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(model))
+        cls._write(shm.buf, model)
+        return cls(shm.buf, owner=shm, name=shm.name)
+
+    @classmethod
+    def attach(cls, name):
+        """Maps an already published forest; nothing is copied."""
+        shm = shared_memory.SharedMemory(name=name)
+        # Attaching registers the block with the resource tracker, which would
+        # unlink it when an unrelated worker exits; only the publisher owns it.
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm.buf, owner=shm, name=name)
+
+    @classmethod
+    def save(cls, model, path):
+        """Writes the same layout to a file for open()."""
+        buf = bytearray(cls._size(model))
+        cls._write(buf, model)
+        with open(path, "wb") as f:
+            f.write(buf)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm, owner=mm, name=path)
+
+    def close(self):
+        """Drops this process's mapping."""
+        for key, *_ in ARRAYS:
+            setattr(self, key, None)
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def unlink(self):
+        """Frees the shared memory block; call once, from the publisher, after workers are done."""
+        owner = self._owner
+        self.close()
+        if isinstance(owner, shared_memory.SharedMemory):
+            # A worker forked from us shares our tracker and may have unregistered the name
+            resource_tracker.register(owner._name, "shared_memory")
+            owner.unlink()
+
+    # ---------------------------------------------------------
+    # PREDICT
+    # ---------------------------------------------------------
+
+    def predict(self, X):
+        """
+        Mean of the trees' leaf values. Every (sample, tree) pair descends one
+        level per step; pairs that reached a leaf drop out of the working set.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected shape (n, {self.n_features}), got {X.shape}")
+        n = len(X)
+        node = np.tile(self.roots, n)
+        sample = np.repeat(np.arange(n), self.n_trees)
+        active = np.arange(n * self.n_trees)
+        while active.size:
+            current = node[active]
+            left = self.left[current]
+            inner = left >= 0
+            active, current, left = active[inner], current[inner], left[inner]
+            go_left = X[sample[active], self.feature[current]] <= self.threshold[current]
+            node[active] = np.where(go_left, left, self.right[current])
+        # Summed tree by tree, in the same order as sklearn, so results match to the last bit
+        leaves = self.value[node].reshape(n, self.n_trees)
+        total = np.zeros(n)
+        for tree in range(self.n_trees):
+            total += leaves[:, tree]
+        return total / self.n_trees
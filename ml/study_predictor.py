@@ -2,8 +2,11 @@ import pandas as pd
 import numpy as np
 import os
 import joblib
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from modules.metrics import timed
+
+# Name of a shared memory block (or path of a file) holding a published forest;
+# when set, load_model() attaches to it instead of unpickling. See ml/shared_forest.py.
+SHARED_MODEL_ENV = "ACADEMIC_SHARED_MODEL"
 
 class StudyHourPredictor:
     def __init__(self):
@@ -12,11 +15,16 @@ class StudyHourPredictor:
         self.data_path = os.path.join(self.base_dir, "student_study_data.csv")
         self.model_path = os.path.join(self.base_dir, "study_model.pkl")
 
+    @timed("ml.train_model")
     def train_model(self):
         if not os.path.exists(self.data_path):
             print("Dataset not found. Please run dataset_generator.py first.")
             return
 
+        # Imported here so processes that only attach to a shared model never load sklearn
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.model_selection import train_test_split
+
         df = pd.read_csv(self.data_path)
         X = df[["current_score", "target_score", "gap", "attendance"]]
         y = df["recommended_hours"]
@@ -29,13 +37,19 @@ class StudyHourPredictor:
         joblib.dump(self.model, self.model_path)
         print("✅ Model Trained Successfully")
 
+    @timed("ml.load_model")
     def load_model(self):
-        if os.path.exists(self.model_path):
+        shared = os.environ.get(SHARED_MODEL_ENV)
+        if shared:
+            from ml.shared_forest import SharedForest
+            self.model = SharedForest.open(shared) if os.path.isfile(shared) else SharedForest.attach(shared)
+        elif os.path.exists(self.model_path):
             self.model = joblib.load(self.model_path)
         else:
             print("Model not found, training new one...")
             self.train_model()
 
+    @timed("ml.predict_hours")
     def predict_hours(self, current_score, target_score, attendance_pct):
         if self.model is None:
             self.load_model()
@@ -49,4 +63,25 @@ class StudyHourPredictor:
         }])
         
         prediction = self.model.predict(features)[0]
-        return round(prediction, 2)
\ No newline at end of file
+        return round(prediction, 2)
+
+    @timed("ml.predict_hours_batch")
+    def predict_hours_batch(self, rows):
+        """
+        rows: sequence of (current_score, target_score, attendance_pct).
+        Returns a list of hours, one model call for the whole batch.
+        """
+        if self.model is None:
+            self.load_model()
+
+        arr = np.asarray(rows, dtype=float).reshape(-1, 3)
+        if len(arr) == 0:
+            return []
+
+        features = pd.DataFrame({
+            "current_score": arr[:, 0],
+            "target_score": arr[:, 1],
+            "gap": np.maximum(0, arr[:, 1] - arr[:, 0]),
+            "attendance": arr[:, 2],
+        })
+        return np.round(self.model.predict(features), 2).tolist()
\ No newline at end of file
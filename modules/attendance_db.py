@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float
-from db.session import Base, get_session
+from datetime import date
+
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, UniqueConstraint, bindparam, text
+from db.session import Base, get_session, ensure_schema, router
+from modules.metrics import timed
 
 # New Table for simple Percentage Storage
 class ManualAttendance(Base):
@@ -9,28 +12,184 @@ class ManualAttendance(Base):
     subject = Column(String, nullable=False)
     percentage = Column(Float, nullable=False, default=0.0)
 
+# One row per lecture a student was marked for
+class AttendanceEvent(Base):
+    __tablename__ = "attendance_events"
+    __table_args__ = (UniqueConstraint("user_id", "subject", "date", "slot", name="uq_attendance_events_lecture"),)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    subject = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    slot = Column(Integer, nullable=False, default=0)   # lecture of the day, for subjects taught twice a day
+    present = Column(Boolean, nullable=False)
+
+# Running totals over attendance_events, kept in the same transaction as the events
+class AttendanceCounter(Base):
+    __tablename__ = "attendance_counters"
+    user_id = Column(Integer, primary_key=True)
+    subject = Column(String, primary_key=True)
+    attended = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+# Attendance per (user_id, subject): logged lectures where there are any, the typed percentage otherwise
+EFFECTIVE_ATTENDANCE = """(
+    SELECT user_id, subject, 100.0 * attended / total AS percentage
+    FROM attendance_counters WHERE total > 0
+    UNION ALL
+    SELECT m.user_id, m.subject, m.percentage FROM manual_attendance m
+    WHERE NOT EXISTS (SELECT 1 FROM attendance_counters c
+                      WHERE c.user_id = m.user_id AND c.subject = m.subject AND c.total > 0)
+)"""
+
+_BUMP_COUNTER = """
+    INSERT INTO attendance_counters (user_id, subject, attended, total)
+    VALUES (:uid, :subject, :attended, :total)
+    ON CONFLICT (user_id, subject) DO UPDATE
+    SET attended = attendance_counters.attended + excluded.attended,
+        total = attendance_counters.total + excluded.total
+"""
+
+
+def projected_percent(attended, total, upcoming, will_attend):
+    """Attendance after `upcoming` more lectures of which `will_attend` are attended."""
+    total += upcoming
+    return round(100.0 * (attended + will_attend) / total, 2) if total else 0.0
+
+
 class AttendanceDB:
-    def set_attendance_percentage(self, user_id, subject, percent):
+    def __init__(self):
         session = get_session()
         try:
-            # Check if entry exists
-            row = session.query(ManualAttendance).filter_by(user_id=user_id, subject=subject).first()
-            if row:
-                row.percentage = percent
+            ensure_schema(session.get_bind())
+        finally:
+            session.close()
+
+    @timed()
+    def set_attendance_percentage(self, user_id, subject, percent):
+        self.set_attendance_percentages(user_id, {subject: percent})
+
+    @timed()
+    def set_attendance_percentages(self, user_id, percentages):
+        """Saves {subject: percent} in a single transaction."""
+        if not percentages:
+            return
+        session = get_session(user_id)
+        try:
+            existing = {
+                row.subject: row for row in session.query(ManualAttendance).filter(
+                    ManualAttendance.user_id == user_id, ManualAttendance.subject.in_(list(percentages))
+                )
+            }
+            for subject, percent in percentages.items():
+                row = existing.get(subject)
+                if row:
+                    row.percentage = percent
+                else:
+                    session.add(ManualAttendance(user_id=user_id, subject=subject, percentage=percent))
+            session.commit()
+        finally:
+            session.close()
+
+    @timed()
+    def mark_lecture(self, user_id, subject, present, day=None, slot=0):
+        """
+        Records one lecture and updates the running counter in the same
+        transaction. Marking the same lecture again overwrites the earlier mark.
+        """
+        day = day or date.today()
+        session = get_session(user_id)
+        try:
+            previous = session.query(AttendanceEvent).filter_by(
+                user_id=user_id, subject=subject, date=day, slot=slot
+            ).first()
+            present = bool(present)
+            if previous is None:
+                session.add(AttendanceEvent(user_id=user_id, subject=subject, date=day, slot=slot, present=present))
+                delta = (int(present), 1)
+            elif previous.present != present:
+                previous.present = present
+                delta = (1 if present else -1, 0)
             else:
-                new_entry = ManualAttendance(user_id=user_id, subject=subject, percentage=percent)
-                session.add(new_entry)
+                return
+            session.flush()
+            session.execute(text(_BUMP_COUNTER), {"uid": user_id, "subject": subject,
+                                                  "attended": delta[0], "total": delta[1]})
             session.commit()
+        except:
+            session.rollback()
+            raise
         finally:
             session.close()
 
+    @timed()
+    def mark_class(self, subject, present, day=None, slot=0, user_ids=None):
+        """
+        Marks every student taking `subject` (or just `user_ids`) present or
+        absent for one lecture: one INSERT ... SELECT FROM subjects for the
+        events and one for the counters, per shard. Students already marked
+        for that lecture keep their mark. Returns the number of students marked.
+        """
+        day = day or date.today()
+        params = {"subject": subject, "day": day, "slot": slot, "present": bool(present)}
+        unmarked = """
+            FROM subjects s
+            WHERE s.subject = :subject {users}
+              AND NOT EXISTS (SELECT 1 FROM attendance_events e
+                              WHERE e.user_id = s.user_id AND e.subject = s.subject
+                                AND e.date = :day AND e.slot = :slot)
+        """
+
+        def mark(session, uids):
+            users = "AND s.user_id IN :uids" if uids is not None else ""
+            shard_params = dict(params, uids=uids) if uids is not None else params
+
+            def stmt(sql):
+                sql = text(sql.format(unmarked=unmarked.format(users=users)))
+                return sql.bindparams(bindparam("uids", expanding=True)) if uids is not None else sql
+
+            try:
+                # Counters first: the NOT EXISTS still sees exactly the students the events insert will add
+                session.execute(stmt("""
+                    INSERT INTO attendance_counters (user_id, subject, attended, total)
+                    SELECT DISTINCT s.user_id, s.subject, CASE WHEN :present THEN 1 ELSE 0 END, 1 {unmarked}
+                    ON CONFLICT (user_id, subject) DO UPDATE
+                    SET attended = attendance_counters.attended + excluded.attended,
+                        total = attendance_counters.total + excluded.total
+                """), shard_params)
+                marked = session.execute(stmt("""
+                    INSERT INTO attendance_events (user_id, subject, date, slot, present)
+                    SELECT DISTINCT s.user_id, s.subject, :day, :slot, :present {unmarked}
+                """), shard_params).rowcount
+                session.commit()
+                return marked
+            except:
+                session.rollback()
+                raise
+
+        return sum(router.fan_out(mark, user_ids))
+
+    @timed()
+    def get_attendance_counts(self, user_id):
+        """{subject: (attended, total)} from the lecture log."""
+        session = get_session(user_id)
+        try:
+            rows = session.query(AttendanceCounter.subject, AttendanceCounter.attended, AttendanceCounter.total)
+            return {s: (a, t) for s, a, t in rows.filter_by(user_id=user_id)}
+        finally:
+            session.close()
+
+    @timed()
     def get_attendance_percent(self, user_id):
         """
         Returns dictionary: {'Math': 85.0, 'Science': 90.0}
+        Subjects with logged lectures use the running counters; the rest use
+        the typed percentage. One query either way.
         """
-        session = get_session()
+        session = get_session(user_id)
         try:
-            rows = session.query(ManualAttendance).filter_by(user_id=user_id).all()
-            return {r.subject: r.percentage for r in rows}
+            rows = session.execute(text(f"""
+                SELECT subject, percentage FROM {EFFECTIVE_ATTENDANCE} a WHERE user_id = :uid
+            """), {"uid": user_id})
+            return dict(rows.all())
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
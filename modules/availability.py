@@ -0,0 +1,148 @@
+"""
+Weekly free-slot bitmasks and a common free-time finder for group study.
+
+Each user's week is stored as up to seven integers in `availability`: bit s
+of free_mask is set when timetable slot s on that weekday has no class, and a
+day without classes has no row (all free). Rows are rewritten from
+`timetable` in the same transaction as every timetable save (TimetableDB).
+rebuild() derives them for existing data; it runs by itself when
+ensure_schema() adds the table to a database that predates it.
+
+FreeSlotFinder loads the masks of a group once (one query per shard) into a
+(users x 7) NumPy array. Intersecting them is a bitwise AND reduction and
+per-slot headcounts are a bit unpack, so ranking every slot of the week for
+hundreds of classmates takes microseconds.
+
+    finder = FreeSlotFinder.load(classmate_ids)
+    finder.common_free()          # [mask per weekday] everyone is free in
+    finder.best_slots(top=5)      # [(weekday, slot, free, of)] most free first
+"""
+from typing import List, NamedTuple
+
+import numpy as np
+from sqlalchemy import Column, Integer, bindparam, event, text
+
+from db.session import Base, router
+from modules.metrics import timed
+
+SLOTS_PER_DAY = 11                      # timetable slots 0-10
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1     # every slot free
+WEEKDAYS = 7
+
+
+class Availability(Base):
+    __tablename__ = "availability"
+    user_id = Column(Integer, primary_key=True)
+    weekday = Column(Integer, primary_key=True)   # 0-6
+    free_mask = Column(Integer, nullable=False)
+
+
+# Busy bits per (user, weekday); DISTINCT so a duplicated cell can't carry into the next bit
+_BUSY = """
+    SELECT user_id, weekday, SUM(bit) AS busy FROM (
+        SELECT DISTINCT user_id, weekday, slot, (1 << slot) AS bit FROM timetable
+        WHERE subject IS NOT NULL AND subject != '' AND slot >= 0 AND slot < :slots {where}
+    ) cells
+    GROUP BY user_id, weekday
+"""
+
+
+def refresh(conn, user_id, weekdays=range(WEEKDAYS)):
+    """
+    Rewrites `user_id`'s masks for `weekdays` from the timetable. Runs on the
+    caller's session or connection, inside its transaction.
+    """
+    params = {"uid": user_id, "days": list(weekdays), "full": FULL_DAY, "slots": SLOTS_PER_DAY}
+    conn.execute(text("""
+        DELETE FROM availability WHERE user_id = :uid AND weekday IN :days
+    """).bindparams(bindparam("days", expanding=True)), params)
+    conn.execute(text(f"""
+        INSERT INTO availability (user_id, weekday, free_mask)
+        SELECT user_id, weekday, :full - busy FROM ({_BUSY.format(where="AND user_id = :uid AND weekday IN :days")}) b
+    """).bindparams(bindparam("days", expanding=True)), params)
+
+
+def rebuild(conn):
+    """Derives every user's masks from scratch; returns the number of rows written."""
+    conn.execute(text("DELETE FROM availability"))
+    return conn.execute(text(f"""
+        INSERT INTO availability (user_id, weekday, free_mask)
+        SELECT user_id, weekday, :full - busy FROM ({_BUSY.format(where="")}) b
+    """), {"full": FULL_DAY, "slots": SLOTS_PER_DAY}).rowcount
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _backfill(metadata, connection, tables=(), **kw):
+    # Fires once create_all() has made every missing table, so `timetable` exists by now
+    if Availability.__table__ in tables:
+        rebuild(connection)
+
+
+def slots_in(mask) -> List[int]:
+    return [s for s in range(SLOTS_PER_DAY) if mask >> s & 1]
+
+
+class FreeSlot(NamedTuple):
+    weekday: int
+    slot: int
+    free: int      # users free in this slot
+    of: int        # users in the group
+
+
+class FreeSlotFinder:
+    def __init__(self, user_ids, masks):
+        self.user_ids = list(user_ids)
+        self.masks = masks            # uint16 (users x 7); days without a stored row are fully free
+
+    @classmethod
+    @timed("availability.load")
+    def load(cls, user_ids):
+        user_ids = list(dict.fromkeys(int(u) for u in user_ids))
+        row_of = {uid: i for i, uid in enumerate(user_ids)}
+        masks = np.full((len(user_ids), WEEKDAYS), FULL_DAY, dtype=np.uint16)
+
+        def read(session, uids):
+            return session.execute(text("""
+                SELECT user_id, weekday, free_mask FROM availability WHERE user_id IN :uids
+            """).bindparams(bindparam("uids", expanding=True)), {"uids": uids}).all()
+
+        if user_ids:
+            for rows in router.fan_out(read, user_ids):
+                for uid, weekday, mask in rows:
+                    masks[row_of[uid], weekday] = mask
+        return cls(user_ids, masks)
+
+    def _rows(self, user_ids):
+        if user_ids is None:
+            return self.masks
+        index = {uid: i for i, uid in enumerate(self.user_ids)}
+        return self.masks[[index[int(u)] for u in user_ids]]
+
+    def common_free(self, user_ids=None) -> List[int]:
+        """Per weekday, the mask of slots every one of `user_ids` (default: all loaded) is free in."""
+        masks = self._rows(user_ids)
+        if not len(masks):
+            return [FULL_DAY] * WEEKDAYS
+        return np.bitwise_and.reduce(masks, axis=0).tolist()
+
+    def free_counts(self, user_ids=None) -> np.ndarray:
+        """(7 x SLOTS_PER_DAY) array: how many of the users are free in each slot."""
+        masks = self._rows(user_ids)
+        bits = (masks[:, :, None] >> np.arange(SLOTS_PER_DAY, dtype=np.uint16)) & 1
+        return bits.sum(axis=0, dtype=np.int64)
+
+    def best_slots(self, user_ids=None, top=5, min_free=2, weekdays=range(WEEKDAYS)) -> List[FreeSlot]:
+        """
+        The `top` slots the most users are free in (ties: earliest in the week),
+        skipping slots fewer than `min_free` users could attend.
+        """
+        counts = self.free_counts(user_ids)
+        group = len(self._rows(user_ids))
+        days = np.asarray(list(weekdays), dtype=np.int64)
+        flat = counts[days].ravel()
+        # Stable sort on descending counts keeps the (weekday, slot) order within ties
+        order = np.argsort(-flat, kind="stable")[:top]
+        return [
+            FreeSlot(int(days[i // SLOTS_PER_DAY]), int(i % SLOTS_PER_DAY), int(flat[i]), group)
+            for i in order if flat[i] >= min_free
+        ]
@@ -1,6 +1,9 @@
+from datetime import date
 from sqlalchemy import Column, Integer, Float, String, Date, text
 from sqlalchemy.orm import Session
-from db.session import Base, get_session
+from db.session import Base, get_session, ensure_schema
+from modules.metrics import timed
+from modules.retention import EXAM_ROWS
 
 # Old CGPA table (kept for compatibility)
 class GoalsDB(Base):
@@ -20,21 +23,23 @@ class GoalsHelper:
     def __init__(self):
         session = get_session()
         try:
-            Base.metadata.create_all(bind=session.get_bind())
+            ensure_schema(session.get_bind())
         finally:
             session.close()
 
+    @timed()
     def get_target_cgpa(self, user_id):
         # Deprecated but safe
-        session = get_session()
+        session = get_session(user_id)
         try:
-            row = session.query(GoalsDB).filter_by(user_id=user_id).first()
-            return row.target_cgpa if row else 0.0
+            value = session.query(GoalsDB.target_cgpa).filter_by(user_id=user_id).scalar()
+            return value if value is not None else 0.0
         finally:
             session.close()
 
+    @timed()
     def set_target_cgpa(self, user_id, value):
-        session = get_session()
+        session = get_session(user_id)
         try:
             row = session.query(GoalsDB).filter_by(user_id=user_id).first()
             if row:
@@ -48,38 +53,75 @@ class GoalsHelper:
         finally:
             session.close()
 
+    @timed()
     def set_subject_target(self, user_id, subject, target):
-        session = get_session()
+        self.set_subject_targets(user_id, {subject: target})
+
+    @timed()
+    def set_subject_targets(self, user_id, targets):
+        """Saves {subject: target} in a single transaction."""
+        if not targets:
+            return
+        session = get_session(user_id)
         try:
-            row = session.query(SubjectGoalDB).filter_by(user_id=user_id, subject=subject).first()
-            if row:
-                row.target_score = target
-            else:
-                row = SubjectGoalDB(user_id=user_id, subject=subject, target_score=target)
-                session.add(row)
+            existing = {
+                row.subject: row for row in session.query(SubjectGoalDB).filter(
+                    SubjectGoalDB.user_id == user_id, SubjectGoalDB.subject.in_(list(targets))
+                )
+            }
+            for subject, target in targets.items():
+                row = existing.get(subject)
+                if row:
+                    row.target_score = target
+                else:
+                    session.add(SubjectGoalDB(user_id=user_id, subject=subject, target_score=target))
             session.commit()
         except:
             session.rollback()
+            raise
         finally:
             session.close()
 
+    @timed()
     def get_subject_target(self, user_id, subject):
-        session = get_session()
+        session = get_session(user_id)
         try:
-            row = session.query(SubjectGoalDB).filter_by(user_id=user_id, subject=subject).first()
-            return row.target_score if row else None
+            return session.query(SubjectGoalDB.target_score).filter_by(
+                user_id=user_id, subject=subject
+            ).limit(1).scalar()
         finally:
             session.close()
 
+    @timed()
+    def get_subject_targets(self, user_id, subjects=None):
+        """{subject: target} for `subjects` (all of the user's targets when None), in one query."""
+        session = get_session(user_id)
+        try:
+            query = session.query(SubjectGoalDB.subject, SubjectGoalDB.target_score).filter(
+                SubjectGoalDB.user_id == user_id
+            )
+            if subjects is not None:
+                query = query.filter(SubjectGoalDB.subject.in_(list(subjects)))
+            # Oldest row wins on duplicates, like get_subject_target's limit(1)
+            targets = {}
+            for subject, target in query.order_by(SubjectGoalDB.id):
+                targets.setdefault(subject, target)
+            return targets
+        finally:
+            session.close()
+
+    @timed()
     def add_mst_score(self, user_id, subject, exam_name, score, max_score):
-        session = get_session()
+        session = get_session(user_id)
         try:
             session.execute(
                 text("""
                 INSERT INTO scores (user_id, subject, exam_name, score, max_score, date)
-                VALUES (:uid, :sub, :exam, :score, :max, DATE('now'))
+                VALUES (:uid, :sub, :exam, :score, :max, :today)
                 """),
-                {"uid": user_id, "sub": subject, "exam": exam_name, "score": score, "max": max_score}
+                # Date bound from Python rather than DATE('now') so the SQL runs on any backend
+                {"uid": user_id, "sub": subject, "exam": exam_name, "score": score, "max": max_score,
+                 "today": date.today()}
             )
             session.commit()
         except:
@@ -87,21 +129,23 @@ class GoalsHelper:
         finally:
             session.close()
 
+    @timed()
     def get_scores_for_user(self, user_id):
-        session = get_session()
+        session = get_session(user_id)
         try:
-            rows = session.execute(text("""
+            rows = session.execute(text(f"""
                 SELECT subject, exam_name, score, max_score
                 FROM scores
-                WHERE user_id = :uid
+                WHERE user_id = :uid AND {EXAM_ROWS}
                 ORDER BY date DESC
             """), {"uid": user_id}).fetchall()
             return [tuple(r) for r in rows]
         finally:
             session.close()
 
+    @timed()
     def get_subject_totals(self, user_id):
-        session = get_session()
+        session = get_session(user_id)
         try:
             query = """
                 SELECT subject, SUM(score) AS total_score, SUM(max_score) AS total_max
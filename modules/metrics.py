@@ -0,0 +1,168 @@
+"""
+Lightweight timing instrumentation for the app's hot paths.
+
+Recording is off by default. Set ACADEMIC_METRICS=1 (or call enable()) to
+collect call counts, total time and latency histograms. When disabled the
+decorators cost a single flag check per call.
+
+Set ACADEMIC_METRICS_FILE to a *.json or *.prom path to write a snapshot
+when the process exits, or call export_json() / export_prometheus() on demand.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Histogram bucket upper bounds (seconds)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get("ACADEMIC_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_stats = {}
+
+
+class _Stat:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def observe(name, seconds):
+    """Record one call of `name` that took `seconds`."""
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _Stat()
+        stat.count += 1
+        stat.total += seconds
+        if seconds > stat.max:
+            stat.max = seconds
+        stat.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+class timer:
+    """
+    Context manager that times a block:
+
+        with timer("ui.show_page.Dashboard"):
+            ...
+    """
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def timed(name=None):
+    """Decorator that records every call of the wrapped function under `name`."""
+    def decorator(fn):
+        metric = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(metric, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Returns {name: {count, total_s, avg_s, max_s, buckets: {le: cumulative}}}."""
+    with _lock:
+        items = [(n, s.count, s.total, s.max, list(s.buckets)) for n, s in _stats.items()]
+
+    result = {}
+    for name, count, total, mx, buckets in sorted(items):
+        cumulative = {}
+        running = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), buckets):
+            running += n
+            cumulative[str(bound)] = running
+        result[name] = {
+            "count": count,
+            "total_s": total,
+            "avg_s": total / count if count else 0.0,
+            "max_s": mx,
+            "buckets": cumulative,
+        }
+    return result
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def export_json(path):
+    _write_atomic(path, json.dumps({"generated_at": time.time(), "metrics": snapshot()}, indent=2))
+
+
+def export_prometheus(path):
+    """Writes the Prometheus text exposition format (e.g. for node_exporter's textfile collector)."""
+    lines = [
+        "# HELP academic_call_duration_seconds Time spent in instrumented calls.",
+        "# TYPE academic_call_duration_seconds histogram",
+    ]
+    for name, stat in snapshot().items():
+        op = name.replace("\\", "\\\\").replace('"', '\\"')
+        for bound, n in stat["buckets"].items():
+            lines.append(f'academic_call_duration_seconds_bucket{{op="{op}",le="{bound}"}} {n}')
+        lines.append(f'academic_call_duration_seconds_sum{{op="{op}"}} {stat["total_s"]:.9f}')
+        lines.append(f'academic_call_duration_seconds_count{{op="{op}"}} {stat["count"]}')
+    _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def export(path):
+    if path.endswith(".json"):
+        export_json(path)
+    else:
+        export_prometheus(path)
+
+
+_export_path = os.environ.get("ACADEMIC_METRICS_FILE")
+if _enabled and _export_path:
+    atexit.register(export, _export_path)
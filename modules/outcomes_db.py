@@ -0,0 +1,140 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, text
+from db.session import Base, get_session, ensure_schema
+from modules.metrics import timed
+from modules.retention import EXAM_ROWS
+
+TARGET_PROGRESS = 0.25   # share of the score gap a plan is expected to close by the next exam
+MIN_LABEL_HOURS = 0.5
+MAX_LABEL_HOURS = 6.0
+
+PLAN = "plan"
+OUTCOME = "outcome"
+
+
+# Append-only log of what the planner predicted and what happened next
+class PlanOutcome(Base):
+    __tablename__ = "plan_outcomes"
+    __table_args__ = (Index("ix_plan_outcomes_kind_user_subject", "kind", "user_id", "subject"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)            # "plan" or "outcome"
+    user_id = Column(Integer, nullable=False)
+    subject = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    agent = Column(String, nullable=True)
+    # plan rows: the features the model saw, its raw prediction, and the newest exam at that time
+    current_score = Column(Float, nullable=True)
+    target_score = Column(Float, nullable=True)
+    attendance = Column(Float, nullable=True)
+    predicted_hours = Column(Float, nullable=True)
+    last_score_id = Column(Integer, nullable=True)
+    # outcome rows: the plan they resolve, the score afterwards and the derived training label
+    plan_id = Column(Integer, nullable=True)
+    score_pct = Column(Float, nullable=True)
+    label_hours = Column(Float, nullable=True)
+
+
+def label_hours(predicted, current, target, score_after):
+    """
+    Hours the plan should have recommended, judged by the exams since: students
+    whose score on them closed less than TARGET_PROGRESS of their gap needed
+    more time, those who closed more needed less.
+    """
+    gap = max(target - current, 1.0)
+    progress = (score_after - current) / gap
+    factor = min(1.5, max(0.5, 1 + (TARGET_PROGRESS - progress)))
+    return round(min(MAX_LABEL_HOURS, max(MIN_LABEL_HOURS, predicted * factor)), 2)
+
+
+class OutcomesDB:
+    def __init__(self):
+        session = get_session()
+        try:
+            ensure_schema(session.get_bind())
+        finally:
+            session.close()
+
+    @timed()
+    def record_plan(self, user_id, predictions, agent):
+        """
+        predictions: dicts with subject, current_score, target_score, attendance, hours.
+        Subjects that already have an open plan since their last exam are skipped,
+        so regenerating a plan doesn't weight one exam window several times.
+        """
+        if not predictions:
+            return 0
+        session = get_session(user_id)
+        try:
+            last_ids = dict(session.execute(text("""
+                SELECT subject, MAX(id) FROM scores WHERE user_id = :uid GROUP BY subject
+            """), {"uid": user_id}).all())
+            open_plans = {
+                (subject, last_id) for subject, last_id in session.execute(text("""
+                    SELECT subject, last_score_id FROM plan_outcomes p
+                    WHERE kind = 'plan' AND user_id = :uid
+                      AND NOT EXISTS (SELECT 1 FROM plan_outcomes o WHERE o.kind = 'outcome' AND o.plan_id = p.id)
+                """), {"uid": user_id})
+            }
+            now = datetime.now()
+            rows = [
+                PlanOutcome(kind=PLAN, user_id=user_id, subject=p["subject"], created_at=now, agent=agent,
+                            current_score=p["current_score"], target_score=p["target_score"],
+                            attendance=p["attendance"], predicted_hours=p["hours"],
+                            last_score_id=last_ids.get(p["subject"], 0))
+                for p in predictions
+                if (p["subject"], last_ids.get(p["subject"], 0)) not in open_plans
+            ]
+            session.add_all(rows)
+            session.commit()
+            return len(rows)
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def resolve(self, session):
+        """
+        Appends an outcome row for every open plan whose subject has had an exam
+        since the plan was made, scored on those exams alone. Returns the number
+        of outcomes written.
+        """
+        rows = session.execute(text(f"""
+            SELECT p.id, p.user_id, p.subject, p.current_score, p.target_score, p.predicted_hours,
+                   SUM(s.score), SUM(s.max_score)
+            FROM plan_outcomes p
+            JOIN scores s ON s.user_id = p.user_id AND s.subject = p.subject
+                         AND s.id > p.last_score_id AND {EXAM_ROWS}
+            WHERE p.kind = 'plan'
+              AND NOT EXISTS (SELECT 1 FROM plan_outcomes o WHERE o.kind = 'outcome' AND o.plan_id = p.id)
+            GROUP BY p.id, p.user_id, p.subject, p.current_score, p.target_score, p.predicted_hours
+        """)).all()
+        now = datetime.now()
+        outcomes = []
+        for plan_id, uid, subject, current, target, predicted, total, total_max in rows:
+            if not total_max:
+                continue
+            # Same sum(score) / sum(max_score) scale as current_score, over the new exams only;
+            # the lifetime total would bury a plan's effect under every earlier exam
+            after = round(float(total) / float(total_max) * 100, 2)
+            outcomes.append(PlanOutcome(kind=OUTCOME, user_id=uid, subject=subject, created_at=now,
+                                        plan_id=plan_id, score_pct=after,
+                                        label_hours=label_hours(predicted, current, target, after)))
+        session.add_all(outcomes)
+        session.commit()
+        return len(outcomes)
+
+    def training_rows(self, session, after_id, agent):
+        """
+        (outcome id, current_score, target_score, attendance, label_hours) for outcomes
+        with id > after_id of plans `agent` made; plans a fallback answered would teach
+        the model its fallback's rule.
+        """
+        return session.execute(text("""
+            SELECT o.id, p.current_score, p.target_score, p.attendance, o.label_hours
+            FROM plan_outcomes o JOIN plan_outcomes p ON p.id = o.plan_id
+            WHERE o.kind = 'outcome' AND o.id > :after AND p.agent = :agent
+            ORDER BY o.id
+        """), {"after": after_id, "agent": agent}).all()
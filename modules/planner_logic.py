@@ -1,25 +1,99 @@
 from __future__ import annotations
 from datetime import datetime, time, timedelta
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Sequence
+
+import numpy as np
 
 from modules.goals_db import GoalsHelper
 from modules.attendance_db import AttendanceDB
-from ml.study_predictor import StudyHourPredictor
+from modules.timetable_db import TimetableDB
+from ml.agents import default_registry, DEFAULT_AGENT
+from ml.performance_predictor import PerformancePredictor
+from modules.metrics import timed
+from modules.query_budget import tracked
+
+# Fallbacks when a subject has no scores / attendance / target yet
+DEFAULT_SCORE = 40.0
+DEFAULT_ATTENDANCE = 75.0
+DEFAULT_TARGET = 100.0
+DEFAULT_CLASS_SLOTS = 5   # assumed class load until the user fills in a timetable
+SLOT_LENGTH_MIN = 50
+
+# Extra weight given to subjects flagged weak by PerformancePredictor
+WEAK_SUBJECT_BOOST = 1.25
+
+# Default what-if grid
+WHAT_IF_TARGETS = tuple(range(50, 101, 5))
+WHAT_IF_ATTENDANCE = tuple(range(50, 101, 10))
+
+
+class WhatIf(NamedTuple):
+    """
+    Predicted study hours over a grid: hours[subject][i, j] is the raw model
+    answer for targets[i] and attendance[j]. Lookups are plain array indexing,
+    so a UI can move along the grid without touching the model again.
+    """
+    targets: np.ndarray
+    attendance: np.ndarray
+    hours: Dict[str, np.ndarray]
+    available_hours: float
+    agent: str
+
+    def _index(self, target, attendance):
+        i = int(np.abs(self.targets - target).argmin())
+        j = int(np.abs(self.attendance - attendance).argmin())
+        return i, j
+
+    def at(self, target, attendance) -> Dict[str, float]:
+        """{subject: hours} at the grid point nearest to (target, attendance)."""
+        i, j = self._index(target, attendance)
+        return {s: float(h[i, j]) for s, h in self.hours.items()}
+
+    def total_curve(self, attendance) -> np.ndarray:
+        """Total hours across subjects for every target, at the nearest attendance."""
+        _, j = self._index(self.targets[0], attendance)
+        return sum(h[:, j] for h in self.hours.values())
+
+def estimate_available_study_hours(class_slots_today=5, total_wake_hours=16.0, buffer_hours=6.5,
+                                   slot_length_min=SLOT_LENGTH_MIN):
+    class_time = (class_slots_today * slot_length_min) / 60.0
+    avail = total_wake_hours - class_time - buffer_hours
+    return round(max(2.0, avail), 2)
+
+
+def class_slots_on(counts: Dict[int, int], weekday: int) -> int:
+    """Class load from {weekday: filled slots}; DEFAULT_CLASS_SLOTS for a user without a timetable."""
+    return counts.get(weekday, 0) if any(counts.values()) else DEFAULT_CLASS_SLOTS
+
 
 class PlannerLogic:
-    def __init__(self, user_id: int):
+    def __init__(self, user_id: int, agent: str = DEFAULT_AGENT, registry=None):
         self.user_id = user_id
-        self.predictor = StudyHourPredictor()
-        self.predictor.load_model()
-        self.slot_length_min = 50
+        # Agents are shared per process and loaded on first use; warming here starts
+        # the load in the background so the first plan rarely needs the fallback.
+        self.registry = registry or default_registry
+        self.agent = agent
+        self.registry.warm(agent)
+        self.last_agent_used = None
+        self.last_predictions = []   # features + raw hours of the last plan, for the outcome log
+        self.slot_length_min = SLOT_LENGTH_MIN
         self.start_time = time(8, 0)
 
     def estimate_available_study_hours(self, total_wake_hours=16.0, class_slots_today=5, buffer_hours=6.5):
-        class_time = (class_slots_today * self.slot_length_min) / 60.0
-        avail = total_wake_hours - class_time - buffer_hours
-        return round(max(2.0, avail), 2)
+        return estimate_available_study_hours(class_slots_today, total_wake_hours, buffer_hours, self.slot_length_min)
+
+    def class_slots_for(self, weekday: int) -> int:
+        """Filled timetable slots on `weekday` (0 = Monday); DEFAULT_CLASS_SLOTS without a timetable."""
+        return class_slots_on(TimetableDB().count_filled_slots_by_weekday(self.user_id), weekday)
 
-    def generate_daily_plan(self, subjects: List[str], class_slots_today: int) -> Dict[str, float]:
+    @timed("planner.generate_daily_plan")
+    @tracked("planner.generate_daily_plan")
+    def generate_daily_plan(self, subjects: List[str], class_slots_today: int,
+                            weak_subjects: Dict[str, List[str]] = None) -> Dict[str, float]:
+        """
+        weak_subjects: {subject: reasons} for this user, if the caller already analyzed
+        the whole cohort; otherwise it is computed here.
+        """
         if not subjects: return {}
 
         # Refresh Data
@@ -32,28 +106,75 @@ class PlannerLogic:
         # This now fetches the manual percentage you saved
         att_map = att_db.get_attendance_percent(self.user_id)
 
-        raw_predictions = {}
+        subjects = list(dict.fromkeys(subjects))
+        targets = goals_db.get_subject_targets(self.user_id, subjects)
+        features = []
         for subj in subjects:
-            curr_score = scores_map.get(subj, 40.0) 
-            att_pct = att_map.get(subj, 75.0) # Default 75 if not set
-            
-            target = goals_db.get_subject_target(self.user_id, subj)
-            final_target = target if target else 100.0
-
-            # Predict
-            pred = self.predictor.predict_hours(curr_score, final_target, att_pct)
-            raw_predictions[subj] = pred
-
-        # Normalize
-        total_predicted = sum(raw_predictions.values())
-        
-        if total_predicted <= 0:
-            return {s: round(available_hours / len(subjects), 2) for s in subjects}
+            target = targets.get(subj)
+            features.append({
+                "subject": subj,
+                "current_score": scores_map.get(subj, DEFAULT_SCORE),
+                "target_score": target if target else DEFAULT_TARGET,
+                "attendance": att_map.get(subj, DEFAULT_ATTENDANCE),
+            })
 
-        factor = available_hours / total_predicted
-        
-        final_plan = {}
-        for subj, h in raw_predictions.items():
-            final_plan[subj] = round(h * factor, 2)
+        # Predict all subjects in one call, within the agent's latency budget
+        hours, self.last_agent_used = self.registry.predict(self.agent, features)
+        raw_predictions = dict(zip(subjects, hours))
+        self.last_predictions = [f | {"hours": h} for f, h in zip(features, hours)]
+
+        if weak_subjects is None:
+            weak_subjects = PerformancePredictor().weak_subjects([self.user_id]).get(self.user_id, {})
+
+        return scale_to_available(boost_weak_subjects(raw_predictions, weak_subjects), available_hours)
+
+
+    @timed("planner.what_if")
+    @tracked("planner.what_if")
+    def what_if(self, subjects: List[str], targets: Sequence[float] = WHAT_IF_TARGETS,
+                attendance: Sequence[float] = WHAT_IF_ATTENDANCE, class_slots_today: int = DEFAULT_CLASS_SLOTS) -> WhatIf:
+        """
+        "How many hours if I aim for 85 instead of 95?" for every subject at
+        once: the same target and attendance are tried for all subjects over
+        the targets x attendance grid, each with the subject's own current
+        score, in one batched prediction.
+        """
+        subjects = list(dict.fromkeys(subjects))
+        targets = np.asarray(targets, dtype=float)
+        attendance = np.asarray(attendance, dtype=float)
+        scores_map = GoalsHelper().get_subject_totals(self.user_id)
+
+        # subject-major, then target, then attendance: reshapes straight back into the grid
+        t_grid, a_grid = np.meshgrid(targets, attendance, indexing="ij")
+        features = [
+            {"current_score": scores_map.get(subj, DEFAULT_SCORE), "target_score": t, "attendance": a}
+            for subj in subjects
+            for t, a in zip(t_grid.ravel().tolist(), a_grid.ravel().tolist())
+        ]
+        hours, agent = self.registry.predict(self.agent, features)
+        grid = np.asarray(hours, dtype=float).reshape(len(subjects), len(targets), len(attendance))
+        return WhatIf(targets, attendance, dict(zip(subjects, grid)),
+                      self.estimate_available_study_hours(class_slots_today=class_slots_today), agent)
+
+
+def boost_weak_subjects(raw_predictions: Dict[str, float], weak_subjects) -> Dict[str, float]:
+    return {s: h * WEAK_SUBJECT_BOOST if s in weak_subjects else h for s, h in raw_predictions.items()}
+
+
+def scale_to_available(raw_predictions: Dict[str, float], available_hours: float) -> Dict[str, float]:
+    """Normalizes raw per-subject predictions so they add up to the available hours."""
+    if not raw_predictions:
+        return {}
+
+    total_predicted = sum(raw_predictions.values())
+
+    if total_predicted <= 0:
+        return {s: round(available_hours / len(raw_predictions), 2) for s in raw_predictions}
+
+    factor = available_hours / total_predicted
+
+    final_plan = {}
+    for subj, h in raw_predictions.items():
+        final_plan[subj] = round(h * factor, 2)
 
-        return final_plan
\ No newline at end of file
+    return final_plan
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+SQL statement accounting per logical operation.
+
+Every helper in modules/ opens its own session, so an extra query per
+subject is easy to add without noticing. Engine and Session event hooks
+count, for whatever operation is active on the current thread:
+
+  statements  SQL statements sent to the database (any engine or shard)
+  sessions    transactions begun (one per helper call that touches the DB)
+  rows        rows changed by INSERT / UPDATE / DELETE; rows a SELECT
+              returns are not visible to engine events
+
+Operations are marked with track() or the @tracked decorator and nest; an
+inner operation's statements also count towards the outer one. Totals per
+operation are kept for snapshot(). Operations with an entry in BUDGETS log
+a warning when they go over it.
+
+statement_budget() asserts a limit instead, for checks like
+benchmarks/query_budget.py:
+
+    with statement_budget(5, "planner for 20 subjects"):
+        planner.generate_daily_plan(subjects, 5)
+"""
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+# Statement ceilings for tracked operations; going over one logs a warning
+BUDGETS = {
+    "planner.generate_daily_plan": 5,
+}
+
+_active = contextvars.ContextVar("query_budget_active", default=())
+_lock = threading.Lock()
+_totals = {}
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+class Usage:
+    """What one operation sent to the database."""
+    __slots__ = ("name", "statements", "sessions", "rows", "sql", "_lock")
+
+    def __init__(self, name=None):
+        self.name = name
+        self.statements = 0
+        self.sessions = 0
+        self.rows = 0
+        self.sql = []
+        self._lock = threading.Lock()   # shard fan-out counts from several threads
+
+    def __repr__(self):
+        return f"<Usage {self.name or ''} statements={self.statements} sessions={self.sessions} rows={self.rows}>"
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    for usage in _active.get():
+        with usage._lock:
+            usage.statements += 1
+            usage.sql.append(" ".join(statement.split()))
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    active = _active.get()
+    if not active or cursor.rowcount is None or cursor.rowcount < 0:
+        return
+    for usage in active:
+        with usage._lock:
+            usage.rows += cursor.rowcount
+
+
+def _after_begin(session, transaction, connection):
+    for usage in _active.get():
+        with usage._lock:
+            usage.sessions += 1
+
+
+event.listen(Engine, "before_cursor_execute", _before_execute)
+event.listen(Engine, "after_cursor_execute", _after_execute)
+event.listen(Session, "after_begin", _after_begin)
+
+
+def _record(usage):
+    with _lock:
+        total = _totals.get(usage.name)
+        if total is None:
+            total = _totals[usage.name] = {"calls": 0, "statements": 0, "sessions": 0, "rows": 0,
+                                           "max_statements": 0}
+        total["calls"] += 1
+        total["statements"] += usage.statements
+        total["sessions"] += usage.sessions
+        total["rows"] += usage.rows
+        total["max_statements"] = max(total["max_statements"], usage.statements)
+
+    limit = BUDGETS.get(usage.name)
+    if limit is not None and usage.statements > limit:
+        log.warning("%s ran %d SQL statements (budget %d)", usage.name, usage.statements, limit)
+
+
+@contextmanager
+def track(name=None):
+    """Counts the statements run inside the block; yields the live Usage."""
+    usage = Usage(name)
+    token = _active.set(_active.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _active.reset(token)
+        if name is not None:
+            _record(usage)
+
+
+def tracked(name=None):
+    """Decorator form of track(); the operation is named after the function by default."""
+    def decorator(fn):
+        op = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(op):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def statement_budget(max_statements, label="block", max_sessions=None):
+    """Raises BudgetExceeded, listing the statements, if the block runs more than allowed."""
+    with track() as usage:
+        yield usage
+    problems = []
+    if usage.statements > max_statements:
+        problems.append(f"{usage.statements} statements (budget {max_statements})")
+    if max_sessions is not None and usage.sessions > max_sessions:
+        problems.append(f"{usage.sessions} sessions (budget {max_sessions})")
+    if problems:
+        listing = "\n".join(f"  {i + 1}. {sql[:200]}" for i, sql in enumerate(usage.sql))
+        raise BudgetExceeded(f"{label}: {', '.join(problems)}\n{listing}")
+
+
+def snapshot():
+    """{operation: {calls, statements, sessions, rows, max_statements}} since start or reset()."""
+    with _lock:
+        return {name: dict(total) for name, total in sorted(_totals.items())}
+
+
+def reset():
+    with _lock:
+        _totals.clear()
@@ -0,0 +1,54 @@
+"""
+Read-only result types returned by the DB helpers.
+
+The helpers select just the columns they need and hand back these slotted
+records instead of ORM entities, so reads skip the identity map and
+attribute instrumentation entirely.
+"""
+from typing import NamedTuple, Optional
+
+
+class SlotEntry(NamedTuple):
+    """One timetable cell; unpacks as (subject, class_type) like before."""
+    subject: Optional[str]
+    class_type: Optional[str]
+
+
+class UserRecord:
+    """
+    A logged-in user. Immutable, and readable both as user.id and user["id"]
+    so code written against the old dict keeps working.
+    """
+    __slots__ = ("id", "name", "username", "email")
+
+    def __init__(self, id, name, username, email):
+        for field, value in zip(self.__slots__, (id, name, username, email)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    __delattr__ = __setattr__
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def _astuple(self):
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._astuple() == self._astuple()
+
+    def __hash__(self):
+        return hash(self._astuple())
+
+    def __repr__(self):
+        return f"UserRecord(id={self.id!r}, username={self.username!r})"
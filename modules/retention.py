@@ -0,0 +1,216 @@
+"""
+Score history retention: roll old exams up, archive them, reclaim space.
+
+    python -m modules.retention --horizon-days 365 --archive-dir archive
+
+Exams older than the horizon are replaced by one summary row per
+(user, subject, term) in `scores` itself, named "ROLLUP <term>", whose score
+and max_score are the sums of the exams it replaces. Every SUM() over scores,
+and therefore get_subject_totals, gives exactly the same result afterwards;
+each chunk is checked for that before it commits. Per-exam statistics, exam
+lists and charts skip rollup rows with EXAM_ROWS. The raw rows go to a
+gzipped JSONL archive first, cached rolling aggregates for the touched
+subjects are dropped, and SQLite files get an incremental VACUUM.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, text
+
+from db.session import get_session, ensure_schema, router
+from modules.metrics import timed
+
+log = logging.getLogger(__name__)
+
+HORIZON_DAYS = int(os.environ.get("ACADEMIC_RETENTION_DAYS", 365))
+ARCHIVE_DIR = os.environ.get("ACADEMIC_ARCHIVE_DIR", "archive")
+ROLLUP_PREFIX = "ROLLUP "
+# SQL condition for real exams; rollup rows only belong in SUM()-based totals. Case-sensitive
+# like is_rollup(): SQLite's LIKE ignores case and would also hide an exam called "Rollup quiz".
+EXAM_ROWS = f"substr(exam_name, 1, {len(ROLLUP_PREFIX)}) != '{ROLLUP_PREFIX}'"
+CHUNK_USERS = 1000
+VACUUM_PAGES = 10_000   # pages released per incremental_vacuum call
+
+
+def term_of(day):
+    """Two terms a year: S1 = January-June, S2 = July-December."""
+    return f"{day.year}-S{1 if day.month <= 6 else 2}"
+
+
+def is_rollup(exam_name):
+    """
+    The Python side of EXAM_ROWS; both are case-sensitive.
+
+    >>> is_rollup("ROLLUP 2024-S1"), is_rollup("Rollup quiz"), is_rollup("rollup 2024-S1")
+    (True, False, False)
+    """
+    return exam_name.startswith(ROLLUP_PREFIX)
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+class ScoreRetention:
+    def __init__(self, horizon_days=HORIZON_DAYS, archive_dir=ARCHIVE_DIR):
+        self.horizon_days = horizon_days
+        self.archive_dir = archive_dir
+        session = get_session()
+        try:
+            ensure_schema(session.get_bind())  # score_aggregates is cleared below
+        finally:
+            session.close()
+
+    def _totals(self, session, user_ids):
+        rows = session.execute(text("""
+            SELECT user_id, subject, SUM(score), SUM(max_score), COUNT(*) FROM scores
+            WHERE user_id IN :uids GROUP BY user_id, subject
+        """).bindparams(bindparam("uids", expanding=True)), {"uids": user_ids})
+        # Rounded the same way as GoalsHelper.get_subject_totals
+        return {
+            (uid, subj): round(float(total) / float(total_max) * 100, 2) if total_max and total is not None else 0
+            for uid, subj, total, total_max, _ in rows
+        }
+
+    def _compact_chunk(self, session, user_ids, cutoff, archive):
+        old = session.execute(text("""
+            SELECT id, user_id, subject, exam_name, score, max_score, date FROM scores
+            WHERE user_id IN :uids AND date < :cutoff
+            ORDER BY user_id, subject, date, id
+        """).bindparams(bindparam("uids", expanding=True)), {"uids": user_ids, "cutoff": cutoff}).all()
+
+        # Only terms that still hold raw exams need (re)rolling; existing rollups of those terms merge in
+        groups = {}
+        for row in old:
+            key = (row.user_id, row.subject, term_of(_as_date(row.date)))
+            groups.setdefault(key, []).append(row)
+        groups = {k: rows for k, rows in groups.items() if any(not is_rollup(r.exam_name) for r in rows)}
+        if not groups:
+            return 0, 0
+
+        before = self._totals(session, user_ids)
+
+        raw = 0
+        for rows in groups.values():
+            for r in rows:
+                if not is_rollup(r.exam_name):
+                    raw += 1
+                    archive.write(json.dumps({
+                        "id": r.id, "user_id": r.user_id, "subject": r.subject, "exam_name": r.exam_name,
+                        "score": r.score, "max_score": r.max_score, "date": str(_as_date(r.date)),
+                    }) + "\n")
+
+        delete_ids = [r.id for rows in groups.values() for r in rows]
+        for i in range(0, len(delete_ids), 5000):
+            session.execute(text("DELETE FROM scores WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                            {"ids": delete_ids[i:i + 5000]})
+        session.execute(text("""
+            INSERT INTO scores (user_id, subject, exam_name, score, max_score, date)
+            VALUES (:uid, :subject, :exam, :score, :max_score, :date)
+        """), [
+            {"uid": uid, "subject": subj, "exam": ROLLUP_PREFIX + term,
+             "score": sum(r.score for r in rows), "max_score": sum(r.max_score for r in rows),
+             "date": max(_as_date(r.date) for r in rows)}
+            for (uid, subj, term), rows in groups.items()
+        ])
+
+        after = self._totals(session, user_ids)
+        if after != before:
+            changed = sorted(k for k in before if before[k] != after.get(k))[:5]
+            raise RuntimeError(f"rollup would change subject totals for {changed}")
+
+        # Cached rolling aggregates for these subjects describe rows that no longer exist
+        touched = sorted({(uid, subj) for uid, subj, _ in groups})
+        session.execute(text("DELETE FROM score_aggregates WHERE user_id = :uid AND subject = :subject"),
+                        [{"uid": uid, "subject": subj} for uid, subj in touched])
+        return raw, len(groups)
+
+    def _vacuum(self, bind):
+        if bind.dialect.name != "sqlite":
+            log.info("Skipping VACUUM on %s; rely on the server's autovacuum", bind.dialect.name)
+            return
+        with bind.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                # Switching to incremental mode needs one full VACUUM; later runs are incremental
+                conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.exec_driver_sql("VACUUM")
+            else:
+                while conn.exec_driver_sql("PRAGMA freelist_count").scalar():
+                    conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+
+    def _compact_shard(self, session, _, cutoff):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        bind = session.get_bind()
+        shard = os.path.splitext(os.path.basename(bind.url.database or "db"))[0]
+        path = os.path.join(self.archive_dir, f"scores-{shard}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        archived = rolled = 0
+        with gzip.open(path, "wt", encoding="utf-8") as archive:
+            last_uid = 0
+            while True:
+                user_ids = [uid for (uid,) in session.execute(text("""
+                    SELECT DISTINCT user_id FROM scores
+                    WHERE date < :cutoff AND user_id > :last ORDER BY user_id LIMIT :n
+                """), {"cutoff": cutoff, "last": last_uid, "n": CHUNK_USERS})]
+                if not user_ids:
+                    break
+                try:
+                    raw, groups = self._compact_chunk(session, user_ids, cutoff, archive)
+                    # Archive is on disk before the raw rows are gone for good
+                    archive.flush()
+                    os.fsync(archive.fileno())
+                    session.commit()
+                except:
+                    session.rollback()
+                    raise
+                archived += raw
+                rolled += groups
+                last_uid = user_ids[-1]
+        if not archived:
+            os.remove(path)
+            path = None
+        session.close()
+        self._vacuum(bind)
+        return {"archived": archived, "rollups": rolled, "archive": path}
+
+    @timed()
+    def compact(self, today=None):
+        """Compacts every shard; returns one summary dict per shard."""
+        cutoff = (today or date.today()) - timedelta(days=self.horizon_days)
+        return router.fan_out(lambda session, uids: self._compact_shard(session, uids, cutoff))
+
+
+def _db_size():
+    total = 0
+    for shard in range(router.count):
+        path = router.engine(shard).url.database
+        if path and os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizon-days", type=int, default=HORIZON_DAYS)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    size_before = _db_size()
+    results = ScoreRetention(args.horizon_days, args.archive_dir).compact()
+    size_after = _db_size()
+    archived = sum(r["archived"] for r in results)
+    rollups = sum(r["rollups"] for r in results)
+    print(f"✅ Rolled {archived} exams into {rollups} term summaries; "
+          f"database {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB")
+    for r in results:
+        if r["archive"]:
+            print(f"  archived to {r['archive']}")
+
+
+if __name__ == "__main__":
+    main()
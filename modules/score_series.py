@@ -0,0 +1,124 @@
+"""
+Per-subject score-over-time series for charts, downsampled to what a widget
+can actually show.
+
+A student with years of exams has thousands of (date, pct) points per
+subject, far more than a chart has pixels. lttb() reduces a series to at
+most N points with largest-triangle-three-buckets, which keeps the peaks and
+dips a line chart needs. ScoreSeries caches raw and downsampled series in
+memory per (user, subject) and only reloads a subject when its exam count or
+newest score id changes, so revisiting the dashboard or resizing the chart
+costs one small version query.
+"""
+import threading
+from datetime import date
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from db.session import get_session
+from modules.metrics import timed
+from modules.retention import EXAM_ROWS
+
+MAX_WIDTHS_CACHED = 4   # downsampled copies kept per subject (one per recent chart width)
+
+
+def _as_date(value):
+    # Raw SQL on SQLite hands DATE columns back as ISO strings
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def lttb(xs, ys, n_out):
+    """
+    Largest-triangle-three-buckets: indices of at most n_out points of (xs, ys)
+    that best preserve the line's shape. The first and last points are always
+    kept; from each bucket in between, the point forming the largest triangle
+    with the previously kept point and the next bucket's centroid is chosen.
+    """
+    n = len(xs)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)   # n_out - 2 buckets between the ends
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        cx, cy = xs[nxt_lo:nxt_hi].mean(), ys[nxt_lo:nxt_hi].mean()
+        px, py = xs[prev], ys[prev]
+        area = np.abs((px - cx) * (ys[lo:hi] - py) - (px - xs[lo:hi]) * (cy - py))
+        prev = lo + int(np.argmax(area))
+        keep[b + 1] = prev
+    return keep
+
+
+class ScoreSeries:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}   # (user_id, subject) -> {"version", "dates", "pcts", "sampled": {n: (dates, pcts)}}
+
+    def _versions(self, session, user_id):
+        rows = session.execute(text(f"""
+            SELECT subject, COUNT(*), MAX(id) FROM scores WHERE user_id = :uid AND {EXAM_ROWS} GROUP BY subject
+        """), {"uid": user_id})
+        return {subject: (count, max_id) for subject, count, max_id in rows}
+
+    def _load(self, session, user_id, subjects):
+        rows = session.execute(text(f"""
+            SELECT subject, date, score, max_score FROM scores
+            WHERE user_id = :uid AND subject IN :subjects AND max_score > 0 AND {EXAM_ROWS}
+            ORDER BY subject, date, id
+        """).bindparams(bindparam("subjects", expanding=True)), {"uid": user_id, "subjects": list(subjects)})
+        series = {s: ([], []) for s in subjects}
+        for subject, day, score, max_score in rows:
+            dates, pcts = series[subject]
+            dates.append(_as_date(day))
+            pcts.append(float(score) / float(max_score) * 100)
+        return series
+
+    @timed()
+    def get_series(self, user_id, max_points):
+        """
+        {subject: (dates, pcts)} with at most max_points points per subject,
+        oldest first. Subjects whose scores haven't changed come from the cache.
+        """
+        session = get_session(user_id)
+        try:
+            versions = self._versions(session, user_id)
+            with self._lock:
+                stale = [s for s, v in versions.items()
+                         if self._cache.get((user_id, s), {}).get("version") != v]
+            loaded = self._load(session, user_id, stale) if stale else {}
+        finally:
+            session.close()
+
+        result = {}
+        with self._lock:
+            for subject, (dates, pcts) in loaded.items():
+                self._cache[(user_id, subject)] = {"version": versions[subject], "dates": dates,
+                                                   "pcts": pcts, "sampled": {}}
+            for key in [k for k in self._cache if k[0] == user_id and k[1] not in versions]:
+                del self._cache[key]   # subject has no scores any more
+            for subject in versions:
+                entry = self._cache[(user_id, subject)]
+                sampled = entry["sampled"].get(max_points)
+                if sampled is None:
+                    dates, pcts = entry["dates"], entry["pcts"]
+                    xs = [d.toordinal() for d in dates]
+                    idx = lttb(xs, pcts, max_points)
+                    sampled = ([dates[i] for i in idx], [pcts[i] for i in idx])
+                    if len(entry["sampled"]) >= MAX_WIDTHS_CACHED:
+                        entry["sampled"].pop(next(iter(entry["sampled"])))
+                    entry["sampled"][max_points] = sampled
+                result[subject] = sampled
+        return result
+
+
+# Shared by every DashboardPage so the cache outlives page switches
+default_series = ScoreSeries()
@@ -0,0 +1,183 @@
+from datetime import date, timedelta
+
+from sqlalchemy import Column, Integer, String, Float, Date, UniqueConstraint, bindparam, text
+from db.session import Base, get_session, ensure_schema
+from modules.metrics import timed
+from modules.retention import EXAM_ROWS
+
+LAST_N_EXAMS = 3
+EWMA_ALPHA = 0.3   # weight of the newest exam in the exponentially weighted average
+WINDOWS_DAYS = (30, 90)
+
+
+# Cached rolling aggregates, one row per (user, subject)
+class ScoreAggregate(Base):
+    __tablename__ = "score_aggregates"
+    __table_args__ = (UniqueConstraint("user_id", "subject", name="uq_score_aggregates_user_subject"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    subject = Column(String, nullable=False)
+    last_score_id = Column(Integer, nullable=False)   # newest scores.id folded into the cache
+    exams = Column(Integer, nullable=False)
+    last_date = Column(Date, nullable=True)
+    last_n_pct = Column(Float, nullable=True)
+    pct_30d = Column(Float, nullable=True)
+    pct_90d = Column(Float, nullable=True)
+    ewma_pct = Column(Float, nullable=True)           # unrounded, so appends extend it exactly
+    computed_on = Column(Date, nullable=False)
+
+
+def _pct(score, max_score):
+    return round(float(score) / float(max_score) * 100, 2) if max_score else None
+
+
+def _as_date(value):
+    # Raw SQL on SQLite hands DATE columns back as ISO strings
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _ewma(start, pcts):
+    value = start
+    for p in pcts:
+        value = p if value is None else EWMA_ALPHA * p + (1 - EWMA_ALPHA) * value
+    return value
+
+
+class ScoreTrendsDB:
+    """
+    Rolling score aggregates per subject: last-N exams, 30/90-day windows and an
+    exponentially weighted average, over real exams only (no retention rollups).
+    Results are cached in score_aggregates and only subjects with newly appended
+    scores (or whose date windows moved since the last computation) are
+    recomputed.
+    """
+
+    def __init__(self):
+        session = get_session()
+        try:
+            ensure_schema(session.get_bind())
+        finally:
+            session.close()
+
+    def _windows(self, session, user_id, subjects, today):
+        """Last-N and date-window sums via ROW_NUMBER() over each subject's history."""
+        cutoffs = {f"d{days}": today - timedelta(days=days) for days in WINDOWS_DAYS}
+        stmt = text(f"""
+            SELECT subject,
+                   SUM(CASE WHEN rn <= :n THEN score END), SUM(CASE WHEN rn <= :n THEN max_score END),
+                   SUM(CASE WHEN date >= :d30 THEN score END), SUM(CASE WHEN date >= :d30 THEN max_score END),
+                   SUM(CASE WHEN date >= :d90 THEN score END), SUM(CASE WHEN date >= :d90 THEN max_score END)
+            FROM (
+                SELECT subject, score, max_score, date,
+                       ROW_NUMBER() OVER (PARTITION BY subject ORDER BY date DESC, id DESC) AS rn
+                FROM scores
+                WHERE user_id = :uid AND subject IN :subjects AND {EXAM_ROWS}
+            ) ranked
+            GROUP BY subject
+        """).bindparams(bindparam("subjects", expanding=True))
+        rows = session.execute(stmt, {"uid": user_id, "subjects": list(subjects), "n": LAST_N_EXAMS, **cutoffs})
+        return {
+            subj: (_pct(ln_s, ln_m), _pct(s30, m30), _pct(s90, m90))
+            for subj, ln_s, ln_m, s30, m30, s90, m90 in rows
+        }
+
+    def _new_pcts(self, session, user_id, subjects, after_ids):
+        """Scores per subject newer than the cached id, oldest first."""
+        stmt = text(f"""
+            SELECT id, subject, score, max_score, date FROM scores
+            WHERE user_id = :uid AND subject IN :subjects AND id > :min_id AND {EXAM_ROWS}
+            ORDER BY subject, date, id
+        """).bindparams(bindparam("subjects", expanding=True))
+        min_id = min(after_ids.get(s, 0) for s in subjects)
+        result = {s: [] for s in subjects}
+        for score_id, subj, score, max_score, day in session.execute(
+                stmt, {"uid": user_id, "subjects": list(subjects), "min_id": min_id}):
+            if score_id > after_ids.get(subj, 0):
+                pct = float(score) / float(max_score) * 100 if max_score else None
+                result[subj].append((score_id, pct, _as_date(day)))
+        return result
+
+    def _appends_only(self, cached, new_rows, count):
+        """True if the only change since `cached` was written is newer exams added on top."""
+        if cached.exams + len(new_rows) != count:
+            return False
+        return cached.last_date is None or all(d >= cached.last_date for _, _, d in new_rows)
+
+    @timed()
+    def get_rolling_aggregates(self, user_id, today=None):
+        """
+        Returns {subject: {"exams", "last_n_pct", "pct_30d", "pct_90d", "ewma_pct"}}.
+        Percentages are sum(score) / sum(max_score) within the window, None if it is empty.
+        """
+        today = today or date.today()
+        session = get_session(user_id)
+        try:
+            current = {
+                subj: (last_id, count) for subj, last_id, count in session.execute(text(f"""
+                    SELECT subject, MAX(id), COUNT(*) FROM scores
+                    WHERE user_id = :uid AND {EXAM_ROWS} GROUP BY subject
+                """), {"uid": user_id})
+            }
+            cached = {row.subject: row for row in session.query(ScoreAggregate).filter_by(user_id=user_id)}
+
+            # Subjects whose history or date windows changed since the cache was written
+            stale = [
+                s for s, (last_id, count) in current.items()
+                if s not in cached or cached[s].last_score_id != last_id
+                or cached[s].exams != count or cached[s].computed_on != today
+            ]
+            for subj in set(cached) - set(current):
+                session.delete(cached.pop(subj))
+
+            if stale:
+                windows = self._windows(session, user_id, stale, today)
+
+                # EWMA continues from the cached value when exams were only appended;
+                # deleted or back-dated rows force a full replay of that subject.
+                after_ids = {
+                    s: cached[s].last_score_id if s in cached and cached[s].ewma_pct is not None else 0
+                    for s in stale
+                }
+                new_rows = self._new_pcts(session, user_id, stale, after_ids)
+                replay = [s for s in stale if after_ids[s] and not self._appends_only(cached[s], new_rows[s], current[s][1])]
+                if replay:
+                    new_rows.update(self._new_pcts(session, user_id, replay, {s: 0 for s in replay}))
+                full = set(replay) | {s for s in stale if not after_ids[s]}
+
+                for s in stale:
+                    rows = new_rows[s]
+                    row = cached.get(s)
+                    if row is None:
+                        row = ScoreAggregate(user_id=user_id, subject=s)
+                        session.add(row)
+                        cached[s] = row
+
+                    ewma = _ewma(None if s in full else row.ewma_pct, [p for _, p, _ in rows if p is not None])
+                    dates = [d for _, _, d in rows]
+                    if s not in full and row.last_date:
+                        dates.append(row.last_date)
+
+                    row.last_score_id = current[s][0]
+                    row.exams = current[s][1]
+                    row.last_date = max(dates, default=None)
+                    row.last_n_pct, row.pct_30d, row.pct_90d = windows.get(s, (None, None, None))
+                    row.ewma_pct = ewma
+                    row.computed_on = today
+
+            session.commit()
+            return {
+                s: {
+                    "exams": row.exams,
+                    "last_n_pct": row.last_n_pct,
+                    "pct_30d": row.pct_30d,
+                    "pct_90d": row.pct_90d,
+                    "ewma_pct": round(row.ewma_pct, 2) if row.ewma_pct is not None else None,
+                }
+                for s, row in sorted(cached.items())
+            }
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, Index
 from db.session import Base
 
 class ScoresDB(Base):
     __tablename__ = "scores"
-    
+    __table_args__ = (
+        # Serves per-user/per-subject history, window and trend queries
+        Index("ix_scores_user_subject_date", "user_id", "subject", "date"),
+    )
+
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, nullable=False)
     subject = Column(String, nullable=False)
@@ -0,0 +1,152 @@
+"""
+Opt-in watchdog for Tk event-loop stalls.
+
+The main loop posts a heartbeat with after() every INTERVAL_MS. A side
+thread watches the heartbeats; when none has arrived for longer than the
+threshold it captures the main thread's stack (sys._current_frames), so the
+log names the callback that was blocking the loop (PlannerPage.generate,
+GoalsPage.refresh_data, MainAppFrame.show_page, ...). The worst stalls of the
+session are summarised when the watchdog stops.
+
+Enable with ACADEMIC_STALL_MS=<threshold in ms>, e.g. ACADEMIC_STALL_MS=250.
+"""
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from modules import metrics
+
+log = logging.getLogger(__name__)
+
+INTERVAL_MS = 50
+WORST_KEPT = 10
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Stall:
+    __slots__ = ("started", "duration", "callback", "stack")
+
+    def __init__(self, started, callback, stack):
+        self.started = started
+        self.duration = 0.0
+        self.callback = callback
+        self.stack = stack
+
+    def __lt__(self, other):
+        return self.duration < other.duration
+
+
+def _is_tk_dispatch(frame):
+    return frame.name == "__call__" and os.sep + "tkinter" + os.sep in frame.filename
+
+
+def _describe(frames):
+    """
+    The outermost project frame below Tk's callback dispatcher is the callback
+    Tk invoked; the innermost project frame is where it was stuck.
+    """
+    start = next((i for i, f in enumerate(frames) if _is_tk_dispatch(f)), 0)
+    ours = [f for f in frames[start:] if f.filename.startswith(PROJECT_ROOT)
+            and os.sep + "site-packages" + os.sep not in f.filename]
+    if not ours:
+        return "<outside app code>"
+    entry, stuck = ours[0], ours[-1]
+    if entry is stuck:
+        return f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+    return f"{entry.name} -> {stuck.name} ({os.path.basename(stuck.filename)}:{stuck.lineno})"
+
+
+class StallWatchdog:
+    def __init__(self, root, threshold_ms=250, interval_ms=INTERVAL_MS):
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = interval_ms
+        self._main_ident = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._current = None
+        self._worst = []        # min-heap of the WORST_KEPT longest stalls
+        self._count = 0
+        self._total = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._after_id = None
+        self._thread = None
+
+    def start(self):
+        self._last_beat = time.monotonic()
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            self._last_beat = now
+            stall, self._current = self._current, None
+        if stall is not None:
+            self._finish(stall, now)
+        if not self._stop.is_set():
+            self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def _watch(self):
+        poll = self.interval_ms / 2000
+        while not self._stop.wait(poll):
+            with self._lock:
+                if self._current is not None:
+                    continue
+                started = self._last_beat
+                if time.monotonic() - started - self.interval_ms / 1000 < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self._main_ident)
+                if frame is None:
+                    continue
+                frames = traceback.extract_stack(frame)
+                self._current = Stall(started, _describe(frames), "".join(frames.format()))
+
+    def _finish(self, stall, now):
+        # The heartbeat was due interval_ms after the previous one
+        stall.duration = now - stall.started - self.interval_ms / 1000
+        self._count += 1
+        self._total += stall.duration
+        heapq.heappush(self._worst, stall)
+        if len(self._worst) > WORST_KEPT:
+            heapq.heappop(self._worst)
+        if metrics.is_enabled():
+            metrics.observe("ui.stall", stall.duration)
+        log.warning("UI stalled for %.0f ms in %s\n%s", stall.duration * 1000, stall.callback, stall.stack)
+
+    def worst(self):
+        return sorted(self._worst, reverse=True)
+
+    def summary(self):
+        if not self._count:
+            return "No UI stalls over %.0f ms this session." % (self.threshold * 1000)
+        lines = [f"{self._count} UI stalls over {self.threshold * 1000:.0f} ms this session, "
+                 f"{self._total:.1f} s frozen in total. Worst:"]
+        for stall in self.worst():
+            lines.append(f"  {stall.duration * 1000:8.0f} ms  {stall.callback}")
+        return "\n".join(lines)
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass  # window already destroyed
+        if self._thread is not None:
+            self._thread.join()
+        log.warning("%s", self.summary())
+
+
+def install(root):
+    """Starts a watchdog on `root` if ACADEMIC_STALL_MS is set, else returns None."""
+    threshold = os.environ.get("ACADEMIC_STALL_MS", "")
+    if threshold in ("", "0"):
+        return None
+    return StallWatchdog(root, threshold_ms=float(threshold)).start()
@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, String
-from db.session import Base, get_session
+from db.session import Base, get_session, ensure_schema
+from modules.metrics import timed
 
 # 1. The SQLAlchemy Model
 class Subject(Base):
@@ -14,12 +15,13 @@ class SubjectsDB:
     def __init__(self):
         session = get_session()
         try:
-            Base.metadata.create_all(bind=session.get_bind())
+            ensure_schema(session.get_bind())
         finally:
             session.close()
 
+    @timed()
     def add_subject(self, user_id, subject_name):
-        session = get_session()
+        session = get_session(user_id)
         try:
             subject_name = subject_name.strip()
             # Check if subject already exists for this user
@@ -36,10 +38,11 @@ class SubjectsDB:
         finally:
             session.close()
 
+    @timed()
     def get_subjects(self, user_id):
-        session = get_session()
+        session = get_session(user_id)
         try:
-            rows = session.query(Subject).filter_by(user_id=user_id).all()
-            return [r.subject for r in rows]
+            rows = session.query(Subject.subject).filter_by(user_id=user_id).all()
+            return [subject for (subject,) in rows]
         finally:
             session.close()
\ No newline at end of file
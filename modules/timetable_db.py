@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String
-from db.session import Base, get_session
+from sqlalchemy import Column, Integer, String, Index, delete, func, insert, tuple_, update
+from db.session import Base, get_session, ensure_schema
+from modules.metrics import timed
+from modules.records import SlotEntry
+from modules import availability
 
-class TimetableDB(Base):
+# 1. The SQLAlchemy Model
+class TimetableEntry(Base):
     __tablename__ = "timetable"
+    __table_args__ = (
+        # Serves per-day reads and the class-load COUNT queries
+        Index("ix_timetable_user_weekday", "user_id", "weekday"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
@@ -11,54 +19,135 @@ class TimetableDB(Base):
     subject = Column(String, nullable=True)
     class_type = Column(String, nullable=True)
 
+# 2. The Helper Class
+class TimetableDB:
     def __init__(self):
         session = get_session()
         try:
-            Base.metadata.create_all(bind=session.get_bind())
+            ensure_schema(session.get_bind())
         finally:
             session.close()
 
+    @timed()
     def set_slot(self, user_id, weekday, slot, subject, class_type):
-        session = get_session()
+        self.set_slots(user_id, {(weekday, slot): (subject, class_type)})
+
+    @timed()
+    def set_slots(self, user_id, slots):
+        """Saves {(weekday, slot): (subject, class_type)} in a single transaction."""
+        if not slots:
+            return
+        session = get_session(user_id)
         try:
-            row = session.query(TimetableDB).filter_by(
-                user_id=user_id, weekday=weekday, slot=slot
-            ).first()
+            existing = {
+                (row.weekday, row.slot): row for row in session.query(TimetableEntry).filter(
+                    TimetableEntry.user_id == user_id,
+                    tuple_(TimetableEntry.weekday, TimetableEntry.slot).in_(list(slots)),
+                )
+            }
+            for (weekday, slot), (subject, class_type) in slots.items():
+                row = existing.get((weekday, slot))
+                if row:
+                    row.subject = subject
+                    row.class_type = class_type
+                else:
+                    session.add(TimetableEntry(user_id=user_id, weekday=weekday, slot=slot,
+                                               subject=subject, class_type=class_type))
+            session.flush()
+            availability.refresh(session, user_id, {weekday for weekday, _ in slots})
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
-            if row:
-                row.subject = subject
-                row.class_type = class_type
-            else:
-                row = TimetableDB(user_id=user_id, weekday=weekday, slot=slot, subject=subject, class_type=class_type)
-                session.add(row)
+    @timed()
+    def set_week(self, user_id, grid):
+        """
+        Saves a whole week: grid[weekday][slot] is (subject, class_type), or None
+        for a free slot. Only cells that differ from the stored rows are
+        written, all in one transaction; stored slots beyond the grid are left
+        alone. Returns the number of cells changed.
+        """
+        session = get_session(user_id)
+        try:
+            stored = {
+                (weekday, slot): (row_id, subject, class_type)
+                for row_id, weekday, slot, subject, class_type in session.query(
+                    TimetableEntry.id, TimetableEntry.weekday, TimetableEntry.slot,
+                    TimetableEntry.subject, TimetableEntry.class_type,
+                ).filter(TimetableEntry.user_id == user_id)
+            }
+            stored_day = {row_id: weekday for (weekday, _), (row_id, _, _) in stored.items()}
+            inserts, updates, deletes = [], [], []
+            for weekday, day in enumerate(grid):
+                for slot, cell in enumerate(day):
+                    subject, class_type = cell if cell and cell[0] else (None, None)
+                    row = stored.get((weekday, slot))
+                    if row is None:
+                        if subject:
+                            inserts.append({"user_id": user_id, "weekday": weekday, "slot": slot,
+                                            "subject": subject, "class_type": class_type})
+                    elif not subject:
+                        if row[1]:
+                            deletes.append(row[0])
+                    elif (subject, class_type) != row[1:]:
+                        updates.append({"id": row[0], "subject": subject, "class_type": class_type})
 
+            if inserts:
+                session.execute(insert(TimetableEntry), inserts)
+            if updates:
+                session.execute(update(TimetableEntry), updates)   # bulk UPDATE by primary key
+            if deletes:
+                session.execute(delete(TimetableEntry).where(TimetableEntry.id.in_(deletes)))
+            changed_days = ({r["weekday"] for r in inserts} | {stored_day[r["id"]] for r in updates}
+                            | {stored_day[row_id] for row_id in deletes})
+            if changed_days:
+                availability.refresh(session, user_id, changed_days)
             session.commit()
+            return len(inserts) + len(updates) + len(deletes)
         except:
             session.rollback()
             raise
         finally:
             session.close()
 
+    @timed()
     def get_slots_for_weekday(self, user_id, weekday):
-        session = get_session()
+        session = get_session(user_id)
         try:
-            rows = session.query(TimetableDB).filter_by(
+            rows = session.query(TimetableEntry.slot, TimetableEntry.subject, TimetableEntry.class_type).filter_by(
                 user_id=user_id, weekday=weekday
             ).all()
-
-            result = {}
-            for r in rows:
-                result[r.slot] = (r.subject, r.class_type)
-            return result
+            return {slot: SlotEntry(subject, class_type) for slot, subject, class_type in rows}
         finally:
             session.close()
 
+    @staticmethod
+    def _filled():
+        return (TimetableEntry.subject.isnot(None), TimetableEntry.subject != "")
+
+    @timed()
     def count_filled_slots_for_date(self, user_id, weekday):
-        session = get_session()
+        session = get_session(user_id)
         try:
-            rows = session.query(TimetableDB).filter_by(
-                user_id=user_id, weekday=weekday
-            ).all()
-            return sum(1 for r in rows if r.subject)
+            return session.query(func.count(TimetableEntry.id)).filter(
+                TimetableEntry.user_id == user_id, TimetableEntry.weekday == weekday, *self._filled()
+            ).scalar()
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    @timed()
+    def count_filled_slots_by_weekday(self, user_id):
+        """{weekday: filled slots} for all seven days, in one query."""
+        session = get_session(user_id)
+        try:
+            rows = session.query(TimetableEntry.weekday, func.count(TimetableEntry.id)).filter(
+                TimetableEntry.user_id == user_id, *self._filled()
+            ).group_by(TimetableEntry.weekday)
+            counts = dict.fromkeys(range(7), 0)
+            counts.update(rows.all())
+            return counts
+        finally:
+            session.close()
@@ -1,4 +1,6 @@
-from db.session import Base, get_session
+from db.session import Base, get_session, ensure_schema
+from modules.metrics import timed
+from modules.records import UserRecord
 from sqlalchemy import Column, Integer, String
 
 # The User Model
@@ -16,10 +18,11 @@ class UsersDB:
     def __init__(self):
         session = get_session()
         try:
-            Base.metadata.create_all(bind=session.get_bind())
+            ensure_schema(session.get_bind())
         finally:
             session.close()
 
+    @timed()
     def register_user(self, name, username, email, password):
         session = get_session()
         try:
@@ -38,22 +41,14 @@ class UsersDB:
         finally:
             session.close()
 
+    @timed()
     def authenticate_user(self, username, password):
         session = get_session()
         try:
-            user = session.query(User).filter(
+            row = session.query(User.id, User.name, User.username, User.email).filter(
                 User.username == username,
                 User.password == password
             ).first()
-            
-            if not user:
-                return None
-
-            return {
-                "id": user.id,
-                "name": user.name,
-                "username": user.username,
-                "email": user.email,
-            }
+            return UserRecord(*row) if row else None
         finally:
             session.close()
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Write-behind queue for saves made from the UI.
+
+Save buttons hand their changes to the queue and return at once; a
+background thread commits them in batches through the helpers' batch
+setters. Repeated writes to the same (user, subject) key are coalesced so
+only the latest value reaches the database.
+
+Reads made through the queue lay pending writes over what is already in the
+database, so a page sees its own saves immediately. Code that reads the
+database directly (e.g. PlannerLogic) should call flush() first, and the
+app calls close() on shutdown.
+
+A group that keeps failing is retried MAX_ATTEMPTS times, then dropped and
+logged; flush() returns False when anything was dropped while it waited, so
+callers can tell the user their change was not saved.
+"""
+import logging
+import threading
+import time
+
+from modules import metrics, query_budget
+from modules.goals_db import GoalsHelper
+from modules.attendance_db import AttendanceDB
+from modules.timetable_db import TimetableDB
+from modules.records import SlotEntry
+
+log = logging.getLogger(__name__)
+
+FLUSH_DELAY_S = 0.2   # how long the writer waits for more saves to coalesce
+RETRY_DELAY_S = 2.0   # wait before retrying a batch that failed (e.g. database locked)
+MAX_ATTEMPTS = 3      # commits tried per group before its writes are dropped
+
+TARGETS = "targets"
+ATTENDANCE = "attendance"
+SLOTS = "slots"
+
+
+class WriteBehindQueue:
+    def __init__(self, goals_db=None, att_db=None, timetable_db=None, delay=FLUSH_DELAY_S):
+        self.goals_db = goals_db or GoalsHelper()
+        self.att_db = att_db or AttendanceDB()
+        self.timetable_db = timetable_db or TimetableDB()
+        self._writers = {
+            TARGETS: self.goals_db.set_subject_targets,
+            ATTENDANCE: self.att_db.set_attendance_percentages,
+            SLOTS: self.timetable_db.set_slots,
+        }
+        self.delay = delay
+
+        self._cond = threading.Condition()
+        self._pending = {}     # (kind, user_id) -> {key: value}, newest value per key
+        self._inflight = {}    # the batch the writer is committing right now
+        self._attempts = {}    # (kind, user_id) -> failed commits in a row
+        self._dropped = 0      # groups given up on so far; flush() compares before and after
+        self._flush_waiters = 0
+        self._closed = False
+        self._thread = None
+
+    # ---------------------------------------------------------
+    # WRITES
+    # ---------------------------------------------------------
+
+    def _put(self, kind, user_id, values):
+        if not values:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("write-behind queue is closed")
+            self._pending.setdefault((kind, user_id), {}).update(values)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def set_subject_targets(self, user_id, targets):
+        self._put(TARGETS, user_id, targets)
+
+    def set_subject_target(self, user_id, subject, target):
+        self._put(TARGETS, user_id, {subject: target})
+
+    def set_attendance_percentages(self, user_id, percentages):
+        self._put(ATTENDANCE, user_id, percentages)
+
+    def set_attendance_percentage(self, user_id, subject, percent):
+        self._put(ATTENDANCE, user_id, {subject: percent})
+
+    def set_slots(self, user_id, slots):
+        self._put(SLOTS, user_id, slots)
+
+    def set_slot(self, user_id, weekday, slot, subject, class_type):
+        self._put(SLOTS, user_id, {(weekday, slot): (subject, class_type)})
+
+    # ---------------------------------------------------------
+    # READS (database + pending writes)
+    # ---------------------------------------------------------
+
+    def _overlay(self, kind, user_id):
+        # Taken before the database read: a batch that commits in between is
+        # then in both, never in neither.
+        with self._cond:
+            merged = dict(self._inflight.get((kind, user_id), {}))
+            merged.update(self._pending.get((kind, user_id), {}))
+        return merged
+
+    def get_subject_target(self, user_id, subject):
+        pending = self._overlay(TARGETS, user_id)
+        if subject in pending:
+            return pending[subject]
+        return self.goals_db.get_subject_target(user_id, subject)
+
+    def get_subject_targets(self, user_id, subjects=None):
+        pending = self._overlay(TARGETS, user_id)
+        result = self.goals_db.get_subject_targets(user_id, subjects)
+        result.update(pending if subjects is None else {s: v for s, v in pending.items() if s in subjects})
+        return result
+
+    def get_attendance_percent(self, user_id):
+        pending = self._overlay(ATTENDANCE, user_id)
+        result = self.att_db.get_attendance_percent(user_id)
+        result.update(pending)
+        return result
+
+    def get_slots_for_weekday(self, user_id, weekday):
+        pending = self._overlay(SLOTS, user_id)
+        result = self.timetable_db.get_slots_for_weekday(user_id, weekday)
+        for (day, slot), (subject, class_type) in pending.items():
+            if day == weekday:
+                result[slot] = SlotEntry(subject, class_type)
+        return result
+
+    def pending_count(self):
+        with self._cond:
+            return sum(len(v) for v in self._pending.values()) + sum(len(v) for v in self._inflight.values())
+
+    # ---------------------------------------------------------
+    # WRITER THREAD
+    # ---------------------------------------------------------
+
+    def _write(self, batch):
+        """Commits a batch, returns the groups that failed."""
+        failed = {}
+        with metrics.timer("write_behind.flush"), query_budget.track("write_behind.flush"):
+            for (kind, user_id), values in batch.items():
+                try:
+                    self._writers[kind](user_id, values)
+                except Exception as e:
+                    log.warning("Write-behind %s for user %s failed: %s", kind, user_id, e)
+                    failed[(kind, user_id)] = values
+        return failed
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+
+                # Let repeated saves pile up briefly, unless someone is waiting on a flush
+                deadline = time.monotonic() + self.delay
+                while not self._closed and not self._flush_waiters:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                self._inflight, self._pending = self._pending, {}
+
+            failed = self._write(self._inflight)
+
+            with self._cond:
+                if failed and self._closed:
+                    lost = sum(len(v) for v in failed.values())
+                    log.error("Dropping %d unsaved writes at shutdown", lost)
+                    self._dropped += len(failed)
+                    failed = {}
+                for group in self._inflight:
+                    if group not in failed:
+                        self._attempts.pop(group, None)
+                for group in list(failed):
+                    self._attempts[group] = self._attempts.get(group, 0) + 1
+                    if self._attempts[group] >= MAX_ATTEMPTS:
+                        kind, user_id = group
+                        log.error("Giving up on %d %s writes for user %s after %d attempts",
+                                  len(failed.pop(group)), kind, user_id, MAX_ATTEMPTS)
+                        del self._attempts[group]
+                        self._dropped += 1
+                # Requeue failures underneath anything saved since
+                for group, values in failed.items():
+                    newer = self._pending.setdefault(group, {})
+                    for key, value in values.items():
+                        newer.setdefault(key, value)
+                self._inflight = {}
+                self._cond.notify_all()
+                if failed:
+                    self._cond.wait(RETRY_DELAY_S)
+
+    def flush(self, timeout=None):
+        """
+        Blocks until everything queued so far is committed. Returns False on
+        timeout or if writes were dropped after failing MAX_ATTEMPTS times.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            dropped = self._dropped
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._inflight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return self._dropped == dropped
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout=10.0):
+        """Flushes and stops the writer thread. Further writes raise."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return flushed
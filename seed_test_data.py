@@ -1,122 +1,205 @@
-import sqlite3
-from datetime import date, timedelta
+"""
+Seeds the database with realistic test data for load testing.
+
+    python seed_test_data.py --users 1000 --subjects-per-user 6 --exams 12
+
+Writes to the real ORM tables (users, subjects, subject_goals,
+manual_attendance, scores, timetable) in large batched transactions (COPY on PostgreSQL),
+then derives the availability bitmasks from the timetable.
+Distributions are skewed on purpose: subject popularity is Zipf-like,
+student ability is beta-distributed, every student has one or two weak
+subjects with lower marks and attendance, and exam history depth varies
+per subject around --exams.
+
+Seeded users can log in with username = password (e.g. student1 / student1).
+"""
+import argparse
+import hashlib
 import random
+from contextlib import ExitStack
+from datetime import date, timedelta
+from itertools import islice
+
+from sqlalchemy import create_engine, func, select
+
+from db.session import (
+    Base, bulk_insert, ensure_indexes, per_user_tables, record_shard_count, engine as default_engine,
+    router as default_router,
+)
+from modules.users_db import User
+from modules.subjects_db import Subject
+from modules.goals_db import SubjectGoalDB
+from modules.attendance_db import ManualAttendance, AttendanceEvent, AttendanceCounter
+from modules.scores_db import ScoresDB
+from modules.timetable_db import TimetableEntry
+from modules import availability
+
+SUBJECT_POOL = [
+    "Math", "Physics", "Chemistry", "CAO", "ML", "IP", "CN", "SE", "DBMS", "OS",
+    "DSA", "TOC", "Compiler Design", "AI", "Statistics", "Economics", "English", "EVS",
+]
+MAX_SCORES = [20, 25, 30, 50, 100]
+MAX_SCORE_WEIGHTS = [3, 2, 4, 2, 1]
+SLOTS_PER_DAY = 8
+BATCH_SIZE = 50_000
+
+SEEDED_TABLES = [ScoresDB, TimetableEntry, AttendanceEvent, AttendanceCounter, ManualAttendance, SubjectGoalDB, Subject, User]
+
+
+def _clamp(x, lo, hi):
+    return max(lo, min(hi, x))
+
+
+def _pick_subjects(rng, weights, k):
+    """Weighted sample without replacement, so popular subjects show up more often."""
+    chosen = []
+    pool = list(range(len(SUBJECT_POOL)))
+    w = list(weights)
+    for _ in range(min(k, len(pool))):
+        i = rng.choices(range(len(pool)), weights=w)[0]
+        chosen.append(SUBJECT_POOL[pool.pop(i)])
+        w.pop(i)
+    return chosen
+
+
+def _generate(users, subjects_per_user, exams, first_id, rng):
+    """Yields (table, row_dict) for every seeded row, one student at a time."""
+    zipf = [1.0 / (rank + 1) ** 0.8 for rank in range(len(SUBJECT_POOL))]
+    today = date.today()
 
-DB_PATH = "academic.db"   # same file your app uses
-
-
-SUBJECTS = ["CAO", "ML", "IP", "CN", "SE"]
-WEAK_SUBJECTS = ["CN", "SE"]   # lower attendance & marks here
+    for uid in range(first_id, first_id + users):
+        username = f"student{uid}"
+        yield User.__table__, {
+            "id": uid,
+            "name": f"Student {uid}",
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": hashlib.sha256(username.encode("utf-8")).hexdigest(),
+        }
+
+        ability = rng.betavariate(5, 2)        # most students decent, a long weak tail
+        diligence = rng.betavariate(4, 1.5)    # drives attendance
+        n_subjects = _clamp(int(rng.gauss(subjects_per_user, 1)), 1, len(SUBJECT_POOL))
+        subjects = _pick_subjects(rng, zipf, n_subjects)
+        weak = set(rng.sample(subjects, k=min(len(subjects), rng.choice([1, 1, 2]))))
+
+        for subj in subjects:
+            skill = ability - (0.2 if subj in weak else 0.0) + rng.gauss(0, 0.05)
+            yield Subject.__table__, {"user_id": uid, "subject": subj}
+            yield SubjectGoalDB.__table__, {
+                "user_id": uid,
+                "subject": subj,
+                "target_score": float(_clamp(round(skill * 100 + rng.uniform(5, 25)), 40, 100)),
+            }
+            att = 55 + 40 * diligence - (12 if subj in weak else 0) + rng.gauss(0, 5)
+            yield ManualAttendance.__table__, {
+                "user_id": uid,
+                "subject": subj,
+                "percentage": round(_clamp(att, 0, 100), 1),
+            }
+
+            # History depth is exponential around the requested mean
+            n_exams = _clamp(int(rng.expovariate(1 / exams)) + 1, 1, exams * 4) if exams else 0
+            trend = rng.gauss(0, 0.01)
+            for i in range(n_exams):
+                max_score = rng.choices(MAX_SCORES, weights=MAX_SCORE_WEIGHTS)[0]
+                pct = _clamp(skill - trend * i + rng.gauss(0, 0.08), 0, 1)
+                yield ScoresDB.__table__, {
+                    "user_id": uid,
+                    "subject": subj,
+                    "exam_name": f"Exam {n_exams - i}",
+                    "score": float(round(pct * max_score)),
+                    "max_score": float(max_score),
+                    "date": today - timedelta(days=14 * i + rng.randint(0, 13)),
+                }
+
+        for weekday in range(5):
+            n_slots = rng.randint(3, min(6, SLOTS_PER_DAY))
+            for slot in range(n_slots):
+                yield TimetableEntry.__table__, {
+                    "user_id": uid,
+                    "weekday": weekday,
+                    "slot": slot,
+                    "subject": rng.choice(subjects),
+                    "class_type": rng.choices(["Lecture", "Lab", "Tutorial"], weights=[6, 2, 1])[0],
+                }
+
+
+def seed(engine, users=100, subjects_per_user=5, exams=10, seed=None, reset=True, batch_size=BATCH_SIZE,
+         router=None):
+    """
+    Seeds `engine` and returns {table_name: rows_inserted}. Given a ShardRouter
+    with more than one shard, users go to `engine` and every other row to its
+    user's shard.
+    """
+    rng = random.Random(seed)
+    reset_tables = per_user_tables() + [User.__table__]   # imports every model, so create_all() makes them all
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    counts = {t.__tablename__: 0 for t in SEEDED_TABLES}
+    shards = router if router is not None and router.count > 1 else None
+    engines = {None: engine}
+    if shards:
+        engines.update({shard: shards.engine(shard) for shard in range(shards.count)})
+
+    with ExitStack() as stack:
+        conns = {key: stack.enter_context(e.begin()) for key, e in engines.items()}
+        conn = conns[None]
+        for c in conns.values():
+            if c.dialect.name == "sqlite":
+                c.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        if reset:
+            # Every per-user table, not just the seeded ones: caches and outcome logs of the
+            # previous run would otherwise attach to the reused user ids
+            for c in conns.values():
+                for table in reset_tables:
+                    c.execute(table.delete())
+        first_id = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+
+        def target(table, row):
+            return None if shards is None or table is User.__table__ else shards.shard_of(row["user_id"])
+
+        pending = {}
+        rows = _generate(users, subjects_per_user, exams, first_id, rng)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            for table, row in chunk:
+                pending.setdefault((target(table, row), table), []).append(row)
+            for (key, table), batch in pending.items():
+                counts[table.name] += bulk_insert(conns[key], table, batch)
+                batch.clear()
+
+        # Free-slot masks are derived from the timetable rows just written
+        counts[availability.Availability.__tablename__] = sum(availability.rebuild(c) for c in conns.values())
+        if router is not None:
+            record_shard_count(conn, router.count)
+
+        if conn.dialect.name == "postgresql":
+            # Explicit ids bypass the serial sequence; move it past them so signups don't collide
+            conn.exec_driver_sql(
+                "SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT COALESCE(MAX(id), 1) FROM users))"
+            )
+
+    return counts
 
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # 1) Clean existing data (so we start fresh)
-    #    If a table doesn't exist yet, ignore the error.
-    for table in ["progress", "timetable", "attendance", "subjects", "users"]:
-        try:
-            cur.execute(f"DELETE FROM {table};")
-        except sqlite3.OperationalError:
-            # table might not exist yet, that's fine
-            pass
-
-    # 2) Insert 2 users
-    users = [
-        (1, "Anshika", "anshika", "anshika@example.com", "anshika"),
-        (2, "Rahul", "rahul", "rahul@example.com", "rahul123"),
-    ]
-    cur.executemany(
-        "INSERT INTO users(id, name, username, email, password) VALUES (?,?,?,?,?)",
-        users,
-    )
-
-    # 3) Insert subjects for both users
-    subject_rows = []
-    for uid in [1, 2]:
-        for s in SUBJECTS:
-            subject_rows.append((uid, s))
-    cur.executemany(
-        "INSERT INTO subjects(user_id, subject) VALUES (?,?)",
-        subject_rows,
-    )
-
-    # 4) Attendance per subject (CN, SE < 75%, others >= 80%)
-    #    Schema assumed: attendance(user_id, subject, attended, total)
-    attendance_rows = []
-    for uid in [1, 2]:
-        for s in SUBJECTS:
-            total = 40
-            if s in WEAK_SUBJECTS:
-                attended = random.randint(20, 28)  # ~50–70%
-            else:
-                attended = random.randint(32, 38)  # >= 80%
-            attendance_rows.append((uid, s, attended, total))
-
-    try:
-        cur.executemany(
-            "INSERT INTO attendance(user_id, subject, attended, total) VALUES (?,?,?,?)",
-            attendance_rows,
-        )
-    except sqlite3.OperationalError:
-        # If your attendance table has a different schema, just skip seeding it.
-        pass
-
-    # 5) Simple weekly timetable (Mon–Fri: 4–5 slots/day)
-    #    Schema assumed: timetable(user_id, weekday, slot, subject)
-    timetable_rows = []
-    # weekday: 0=Mon ... 6=Sun
-    week_pattern = {
-        0: ["CAO", "ML", "IP", "CN"],         # Mon
-        1: ["ML", "CN", "SE", "CAO"],         # Tue
-        2: ["CAO", "IP", "ML", "SE"],         # Wed
-        3: ["ML", "IP", "CN"],                # Thu
-        4: ["SE", "CN", "CAO", "ML"],         # Fri
-    }
-
-    for uid in [1, 2]:
-        for weekday, subs in week_pattern.items():
-            for slot_index, subj in enumerate(subs):
-                timetable_rows.append((uid, weekday, slot_index, subj))
-
-    try:
-        cur.executemany(
-            "INSERT INTO timetable(user_id, weekday, slot, subject) VALUES (?,?,?,?)",
-            timetable_rows,
-        )
-    except sqlite3.OperationalError:
-        # If schema differs, just skip.
-        pass
-
-    # 6) Progress / marks for last 30 days
-    #    Schema: progress(user_id, subject, score, date)
-    today = date.today()
-    progress_rows = []
-    for uid in [1, 2]:
-        for s in SUBJECTS:
-            for i in range(10):  # 10 assessments per subject
-                d = today - timedelta(days=random.randint(0, 29))
-                if s in WEAK_SUBJECTS:
-                    score = random.randint(40, 65)  # weaker
-                else:
-                    score = random.randint(70, 95)  # stronger
-                progress_rows.append((uid, s, score, d.strftime("%Y-%m-%d")))
-
-    try:
-        cur.executemany(
-            "INSERT INTO progress(user_id, subject, score, date) VALUES (?,?,?,?)",
-            progress_rows,
-        )
-    except sqlite3.OperationalError:
-        # If the progress table schema is different, just skip.
-        pass
-
-    # To-Do table seeding removed (feature deprecated)
-
-    conn.commit()
-    conn.close()
-    print("✅ Test data inserted into academic.db")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--subjects-per-user", type=int, default=5)
+    parser.add_argument("--exams", type=int, default=10, help="mean exam history depth per subject")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    parser.add_argument("--append", action="store_true", help="keep existing rows instead of clearing the tables")
+    parser.add_argument("--db-url", help="database URL (defaults to the app's database)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url) if args.db_url else default_engine
+    counts = seed(engine, args.users, args.subjects_per_user, args.exams, args.seed, reset=not args.append,
+                  router=None if args.db_url else default_router)
+    print("✅ Test data inserted: " + ", ".join(f"{n} {t}" for t, n in counts.items()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+"""
+Headless planning service.
+
+    python server.py --host 127.0.0.1 --port 8765 --workers 8
+
+A small HTTP/1.1 JSON API over the same SQLite database the GUI uses, so
+portals and scripts can fetch plans without the customtkinter app.
+Requests are handled on an asyncio event loop; blocking DB and model work
+runs on a bounded thread pool, and every request shares the process-wide
+planner agent, loaded once at startup.
+
+Endpoints:
+  GET  /health
+  GET  /plan?user_id=1[&class_slots=5]   (default: today's timetable)
+  GET  /dashboard?user_id=1
+  POST /scores      {"user_id", "subject", "score", "max_score"[, "exam_name"]}
+  POST /attendance  {"user_id", "subject", "percentage"}
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from db.session import init_db
+from modules.subjects_db import SubjectsDB
+from modules.goals_db import GoalsHelper
+from modules.attendance_db import AttendanceDB
+from modules.planner_logic import PlannerLogic
+from modules.score_trends_db import ScoreTrendsDB
+from modules.outcomes_db import OutcomesDB
+from ml import retrainer
+from ml.agents import default_registry, DEFAULT_AGENT
+from ml.performance_predictor import PerformancePredictor
+
+MAX_BODY_BYTES = 64 * 1024
+HEADER_TIMEOUT_S = 30
+CONTENT_LENGTH = re.compile(r"[0-9]+")   # ASCII only: str.isdigit() also accepts '²', which int() rejects
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _require(data, key, cast):
+    if key not in data:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"missing field '{key}'")
+    try:
+        return cast(data[key])
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid value for '{key}'")
+
+
+class PlanningService:
+    """The blocking operations behind each endpoint. Called from worker threads."""
+
+    def __init__(self):
+        self.subjects_db = SubjectsDB()
+        self.goals_db = GoalsHelper()
+        self.att_db = AttendanceDB()
+        self.trends_db = ScoreTrendsDB()
+        self.outcomes_db = OutcomesDB()
+
+    def plan(self, user_id, class_slots):
+        subjects = self.subjects_db.get_subjects(user_id)
+        targets = self.goals_db.get_subject_targets(user_id, subjects)
+        missing = [s for s in subjects if not targets.get(s)]
+        if missing:
+            return {"user_id": user_id, "plan": {}, "missing_targets": missing}
+
+        logic = PlannerLogic(user_id)
+        if class_slots is None:
+            class_slots = logic.class_slots_for(date.today().weekday())
+        plan = logic.generate_daily_plan(subjects, class_slots_today=class_slots)
+        self.outcomes_db.record_plan(user_id, logic.last_predictions, logic.last_agent_used)
+        return {"user_id": user_id, "plan": plan, "missing_targets": []}
+
+    def dashboard(self, user_id):
+        attendance = self.att_db.get_attendance_percent(user_id)
+        scores = self.goals_db.get_subject_totals(user_id)
+        weak = PerformancePredictor().weak_subjects([user_id]).get(user_id, {})
+        return {
+            "user_id": user_id,
+            "attendance_avg": round(sum(attendance.values()) / len(attendance), 2) if attendance else 0,
+            "score_avg": round(sum(scores.values()) / len(scores), 2) if scores else None,
+            "attendance": attendance,
+            "scores": scores,
+            "weak_subjects": weak,
+            "trends": self.trends_db.get_rolling_aggregates(user_id),
+        }
+
+    def add_score(self, data):
+        user_id = _require(data, "user_id", int)
+        subject = _require(data, "subject", str)
+        score = _require(data, "score", float)
+        max_score = _require(data, "max_score", float)
+        if max_score <= 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "max_score must be positive")
+        exam_name = str(data.get("exam_name") or "Exam")
+        self.goals_db.add_mst_score(user_id, subject, exam_name, score, max_score)
+        return {"ok": True}
+
+    def set_attendance(self, data):
+        user_id = _require(data, "user_id", int)
+        subject = _require(data, "subject", str)
+        pct = _require(data, "percentage", float)
+        if not 0 <= pct <= 100:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "percentage must be between 0 and 100")
+        self.att_db.set_attendance_percentage(user_id, subject, pct)
+        return {"ok": True}
+
+
+class PlanningServer:
+    def __init__(self, service, workers):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planner")
+        # Also bounds the executor's queue: a burst of clients waits here instead of growing a backlog
+        self.in_flight = asyncio.Semaphore(workers * 4)
+
+    async def run_blocking(self, fn, *args):
+        async with self.in_flight:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(fn, *args))
+
+    async def route(self, method, path, query, body):
+        if path == "/health":
+            return {"ok": True}
+
+        if path == "/plan" and method == "GET":
+            user_id = _require(query, "user_id", int)
+            class_slots = _require(query, "class_slots", int) if "class_slots" in query else None
+            return await self.run_blocking(self.service.plan, user_id, class_slots)
+
+        if path == "/dashboard" and method == "GET":
+            return await self.run_blocking(self.service.dashboard, _require(query, "user_id", int))
+
+        if path in ("/scores", "/attendance"):
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "use POST")
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "body must be JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+            handler = self.service.add_score if path == "/scores" else self.service.set_attendance
+            return await self.run_blocking(handler, data)
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {method} {path}")
+
+    async def _readline(self, reader):
+        try:
+            return await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT_S)
+        except (ValueError, asyncio.LimitOverrunError):
+            # readline() raises these for a line longer than the stream's 64 KiB limit
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "request line or header too long")
+
+    async def _read_head(self, reader):
+        """(method, target, version, headers, content length), or None at end of stream."""
+        request_line = await self._readline(reader)
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        raw_length = headers.get("content-length") or "0"
+        if not CONTENT_LENGTH.fullmatch(raw_length):
+            # Also rejects negative lengths, which readexactly() would raise on
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        length = int(raw_length)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "body too large")
+        return method, target, version, headers, length
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await self._read_head(reader)
+                except HTTPError as e:
+                    await self.respond(writer, e.status, {"error": e.message}, False)
+                    break
+                if head is None:
+                    break
+                method, target, version, headers, length = head
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                body = await reader.readexactly(length) if length else b""
+
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    payload = await self.route(method.upper(), url.path, query, body)
+                    status = HTTPStatus.OK
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host, port, workers):
+    init_db()
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=1) as boot:
+        await loop.run_in_executor(boot, default_registry.get, DEFAULT_AGENT)
+
+    background_retrainer = retrainer.start_background(default_registry)
+    server_state = PlanningServer(PlanningService(), workers)
+    server = await asyncio.start_server(server_state.handle, host, port)
+    print(f"Planning service listening on http://{host}:{port} ({workers} workers)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        server_state.executor.shutdown(wait=True)
+        if background_retrainer:
+            background_retrainer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=min(8, (os.cpu_count() or 1) + 4))
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()